@@ -1,16 +1,5 @@
-import os
-import json
-import requests
-import openai
 import streamlit as st
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-from openai import OpenAI
-import re 
-from helper_functions.utility import check_password  
-
-# Load environment variables (OpenAI API key)
-load_dotenv('.env')
+from helper_functions.utility import check_password, show_refresh_status
 
 # Streamlit UI Setup
 st.title("Career Guidance & Skills Development Portal🚀")
@@ -19,6 +8,7 @@ st.subheader("Receive personalized career guidance and learn how to leverage Ski
 # Check if the password is correct.  
 if not check_password():  
     st.stop()
+show_refresh_status()
 
 # Add an aesthetic photo from local drive
 st.image("mainportal_banner.jpg", use_column_width=True)
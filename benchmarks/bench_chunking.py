@@ -0,0 +1,81 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_functions import chunking, report_cache
+from benchmarks.fixtures import report_lines
+
+# """
+# Micro-benchmark of the original `chunk_text` (character budget, re-joins the
+# chunk after every word) against the token-accurate streaming chunker.
+# Uses the cached SDFE report pages when present, else a synthetic report.
+#
+#   python benchmarks/bench_chunking.py --repeat 3
+# """
+
+
+def legacy_chunk_text(text, max_tokens=2000):
+    # Verbatim copy of the chunker previously in the Skills Demand page.
+    words = text.split()
+    chunks = []
+    current_chunk = []
+
+    for word in words:
+        current_chunk.append(word)
+        if len(" ".join(current_chunk)) > max_tokens:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = []
+
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+
+    return chunks
+
+
+def load_pages(page_count):
+    cached = sorted(glob.glob(os.path.join(report_cache.REPORTS_DIR, "*", "pages.json")), key=os.path.getmtime)
+    if cached:
+        with open(cached[-1], encoding="utf-8") as f:
+            return json.load(f), cached[-1]
+    return ["\n".join(report_lines(page)) for page in range(page_count)], "synthetic report"
+
+
+def best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="chunker benchmark")
+    parser.add_argument("--pages", type=int, default=120, help="pages in the synthetic report")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages, source = load_pages(args.pages)
+    text = "\n".join(pages)
+    chunking.get_encoding(chunking.ENCODING_NAME)  # exclude vocabulary loading from the timings
+
+    legacy_time, legacy = best_of(args.repeat, lambda: legacy_chunk_text(text, max_tokens=2000))
+    new_time, chunks = best_of(args.repeat, lambda: list(chunking.chunk_pages(pages)))
+
+    legacy_tokens = [chunking.count_tokens(chunk) for chunk in legacy]
+    print(f"source: {source} ({len(pages)} pages, {len(text):,} characters)")
+    print(f"legacy chunk_text:   {legacy_time * 1000:8.1f} ms, {len(legacy)} chunks, "
+          f"{min(legacy_tokens)}-{max(legacy_tokens)} tokens each")
+    print(f"chunking.chunk_pages:{new_time * 1000:8.1f} ms, {len(chunks)} chunks, "
+          f"{min(c['tokens'] for c in chunks)}-{max(c['tokens'] for c in chunks)} tokens each "
+          f"(budget {chunking.DEFAULT_MAX_TOKENS}, overlap {chunking.DEFAULT_OVERLAP_TOKENS})")
+    print(f"speedup: {legacy_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import argparse
+from openai import OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_functions import embeddings
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.fixtures import report_lines
+
+# """
+# Embeds a few hundred report-sized chunks against the fake OpenAI server:
+# one request per chunk (the old get_embedding usage) versus the batched,
+# concurrent, rate-limited client, with every Nth request rate limited.
+#
+#   python benchmarks/bench_embeddings.py --chunks 300 --latency 0.05 --fail-every 7
+# """
+
+
+def main():
+    parser = argparse.ArgumentParser(description="embedding client benchmark")
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake API latency per request, seconds")
+    parser.add_argument("--fail-every", type=int, default=7, help="answer every Nth request with 429")
+    parser.add_argument("--batch-items", type=int, default=64)
+    args = parser.parse_args()
+
+    texts = [" ".join(report_lines(i, lines_per_page=4)) for i in range(args.chunks)]
+    with FakeOpenAI(latency=args.latency, fail_every=args.fail_every) as server:
+        client = OpenAI(base_url=server.base_url, api_key="test", max_retries=5)
+
+        started = time.perf_counter()
+        for text in texts:
+            client.embeddings.create(input=[text], model=embeddings.EMBEDDING_MODEL)
+        naive = time.perf_counter() - started
+
+        stats = {}
+        vectors = embeddings.embed_texts(texts, client, max_batch_items=args.batch_items, backoff=0.05, stats=stats)
+
+    print(f"one request per chunk: {naive:.2f}s ({args.chunks} requests)")
+    print(f"batched client:        {stats['seconds']:.2f}s ({stats['batches']} batches, {stats['retries']} retries, "
+          f"{stats['tokens_per_sec']:.0f} tokens/sec)")
+    assert vectors.shape[0] == len(texts)
+
+
+if __name__ == "__main__":
+    main()
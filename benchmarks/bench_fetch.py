@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_functions import fetch
+from benchmarks.stub_server import StubServer
+
+# """
+# Compares the old sequential `requests.get` loop with the concurrent fetch
+# engine against a local stub server with per-request latency and a flaky host.
+#
+#   python benchmarks/bench_fetch.py --pages 12 --delay 0.2
+# """
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--delay", type=float, default=0.2, help="server latency per request, seconds")
+    args = parser.parse_args()
+
+    with StubServer() as server:
+        urls = [server.url(f"page/p{i}?delay={args.delay}") for i in range(args.pages)]
+        urls.append(server.url(f"flaky/retry-me?fail=1&delay={args.delay}"))
+
+        started = time.perf_counter()
+        for url in urls[:-1]:
+            requests.get(url).raise_for_status()
+        sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = fetch.fetch_all(urls, backoff=0.05)
+        concurrent = time.perf_counter() - started
+
+        print(fetch.latency_report(results))
+        print()
+        print(f"sequential requests.get ({args.pages} pages): {sequential:.3f}s")
+        print(f"fetch.fetch_all ({len(urls)} URLs incl. one retry): {concurrent:.3f}s")
+        failures = [r for r in results if r['error']]
+        if failures:
+            print(f"{len(failures)} URL(s) failed")
+            return 1
+
+        # A refetch with the ETag of the first response must be answered 304 Not Modified.
+        etag = results[0]['headers'].get('ETag')
+        revalidated = fetch.fetch_all([urls[0]], {urls[0]: {'If-None-Match': etag}} if etag else None)[0]
+        print(f"revalidation with ETag {etag}: HTTP {revalidated['status']}")
+        if revalidated['status'] != 304:
+            print("revalidation did not return 304 Not Modified")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_functions import chunking, html_extract, retrieval, scrape_cache
+from benchmarks.fixtures import make_html_page
+
+# """
+# Compares the original per-page BeautifulSoup extractors (html.parser, every
+# <p>/<h*>/<li>) with the structured extractor: pages/sec, and the size of the
+# text that ends up embedded and prompted. Uses the pages in the scrape cache
+# when present, else synthetic pages with typical site chrome.
+#
+#   python benchmarks/bench_html_extract.py --repeat 3
+# """
+
+
+def parse_general_page(html):
+    # Verbatim copy of the Career Guidance page parser.
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = [p.get_text().strip() for p in soup.find_all('p')]
+    headings = [h.get_text().strip() for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])]
+    lists = [li.get_text().strip() for li in soup.find_all('li')]
+    return {'headings': headings, 'paragraphs': paragraphs, 'lists': lists}
+
+
+def parse_content(html):
+    # Verbatim copy of the SkillsFuture Chatbot page parser.
+    soup = BeautifulSoup(html, 'html.parser')
+    paragraphs = ' '.join([p.get_text() for p in soup.find_all('p')])
+    headings = ' '.join([h.get_text() for h in soup.find_all(['h1', 'h2', 'h3'])])
+    lists = ' '.join([li.get_text() for li in soup.find_all('li')])
+    return {'headings': headings, 'paragraphs': paragraphs, 'lists': lists}
+
+
+def load_pages(count):
+    if os.path.exists(scrape_cache.DB_PATH):
+        conn = sqlite3.connect(scrape_cache.DB_PATH)
+        try:
+            rows = conn.execute("SELECT body FROM pages").fetchall()
+        except sqlite3.Error:
+            rows = []
+        finally:
+            conn.close()
+        pages = [bytes(row[0]).decode("utf-8", "replace") for row in rows if row[0]]
+        if pages:
+            return pages, f"{len(pages)} cached pages"
+    return [make_html_page(i) for i in range(count)], f"{count} synthetic pages"
+
+
+def measure(parse, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parsed = [parse(html) for html in pages]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    texts = [retrieval.page_text(page) for page in parsed]
+    return best, sum(len(text) for text in texts), sum(chunking.count_tokens(text) for text in texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction benchmark")
+    parser.add_argument("--pages", type=int, default=50, help="synthetic pages when the scrape cache is empty")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages, source = load_pages(args.pages)
+    print(f"{source}, {sum(len(html) for html in pages) / 1e6:.2f} MB of HTML; structured parser: {html_extract.PARSER}")
+    results = {
+        'legacy career guidance': measure(parse_general_page, pages, args.repeat),
+        'legacy skillsfuture chatbot': measure(parse_content, pages, args.repeat),
+        'structured sections': measure(html_extract.extract_sections, pages, args.repeat),
+    }
+    _, base_chars, base_tokens = results['legacy career guidance']
+    for name, (seconds, chars, tokens) in results.items():
+        line = f"{name:28s} {len(pages) / seconds:8.1f} pages/s  {chars:9d} chars  {tokens:8d} tokens"
+        if name == 'structured sections' and base_tokens:
+            line += f"  ({100 * (1 - tokens / base_tokens):.0f}% fewer tokens)"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
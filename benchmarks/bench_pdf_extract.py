@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import argparse
+import pdfplumber
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_functions import pdf_extract
+from benchmarks.fixtures import make_report_pdf
+
+# """
+# Compares the original serial `text += page.extract_text()` loop with the
+# process-pool extractor, and shows how soon the first page is available.
+#
+#   python benchmarks/bench_pdf_extract.py                # synthetic 60-page report
+#   python benchmarks/bench_pdf_extract.py --pdf sdfe.pdf
+# """
+
+
+def serial_extract(path):
+    text = ""
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            text += (page.extract_text() or "") + ""
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction benchmark")
+    parser.add_argument("--pdf", help="PDF to extract (defaults to a synthetic report)")
+    parser.add_argument("--pages", type=int, default=60, help="pages in the synthetic report")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.pdf:
+        path = args.pdf
+    else:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".synthetic_report.pdf")
+        with open(path, "wb") as f:
+            f.write(make_report_pdf(args.pages))
+
+    started = time.perf_counter()
+    serial_extract(path)
+    serial = time.perf_counter() - started
+
+    stats = {}
+    started = time.perf_counter()
+    first_page = None
+    for number, _ in pdf_extract.iter_pages(path, workers=args.workers, stats=stats):
+        if first_page is None:
+            first_page = time.perf_counter() - started
+
+    print(f"serial loop:       {serial:.2f}s")
+    print(f"process pool:      {stats['seconds']:.2f}s ({stats['pages_per_sec']:.1f} pages/sec, {stats['pages']} pages)")
+    print(f"first page ready:  {first_page:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
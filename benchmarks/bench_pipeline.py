@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# """
+# End-to-end offline benchmark of the portal's RAG pipeline. Fixture HTML
+# pages and a fixture report PDF are served by the local stub server, and every
+# embedding and chat call goes to the fake OpenAI-compatible server, so a run
+# needs no network and no API key. Each stage is measured separately:
+#
+#   scrape            fetch + structured extraction of a corpus (cold cache)
+#   extract_pdf       per-page text of the report
+#   chunk             corpus sections and report pages into token chunks
+#   embed_index       embedding every chunk into an in-memory index
+#   retrieve          query embedding, BM25 and cosine top-k, fused
+#   <page> answer     one question through the page script itself (AppTest):
+#                     retrieval, prompt packing, LLM stages and rendering
+#
+# For each stage it reports p50/p95 latency, throughput, API tokens and peak
+# Python memory (tracemalloc, from one extra warm-up run). Use --save to
+# record a baseline and --baseline to fail (exit 1) on a regression.
+#
+#   python benchmarks/bench_pipeline.py --repeat 5 --latency 0.05 --save baseline.json
+#   python benchmarks/bench_pipeline.py --repeat 5 --latency 0.05 --baseline baseline.json
+# """
+
+PAGE_APPS = {
+    'career_guidance answer': "pages/1_Career_Guidance.py",
+    'skillsfuture answer': "pages/2_Skillsfuture_Chatbot.py",
+    'report answer': "pages/3_Skills_Demand_For_Future_Economy_Report.py",
+}
+QUERY_TOPICS = ["data analytics", "green economy", "cybersecurity", "care economy", "generative AI",
+                "supply chain", "customer experience", "workplace safety", "sustainability reporting"]
+
+
+def make_query(i):
+    # Distinct wording per run, so the page does the full retrieval and LLM work each time.
+    topic = QUERY_TOPICS[i % len(QUERY_TOPICS)]
+    return f"Question {i}: which courses help me move into {topic} roles within {i % 5 + 1} years?"
+
+
+def measure_stage(name, setup, fake, repeat, items=1):
+    """Returns the stats of stage `name`; `setup(i)` prepares run i and returns the call to time.
+
+    `items` is the work done per run (pages, chunks, queries), or a function
+    returning it once the warm-up run has happened.
+    """
+    call = setup(0)
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    items = items() if callable(items) else items
+
+    seconds = []
+    usage_before = dict(fake.usage)
+    for i in range(1, repeat + 1):
+        call = setup(i)
+        started = time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - started)
+    tokens = {key: (fake.usage[key] - usage_before[key]) / repeat for key in usage_before}
+
+    return {
+        'stage': name,
+        'p50': float(np.percentile(seconds, 50)),
+        'p95': float(np.percentile(seconds, 95)),
+        'throughput': items * repeat / sum(seconds),
+        'items': items,
+        'prompt_tokens': tokens['prompt_tokens'],
+        'completion_tokens': tokens['completion_tokens'],
+        'peak_mb': peak / 1e6,
+    }
+
+
+def run_page_query(app_path, query):
+    """Prepares a logged-in page run; the returned call submits `query` and renders the answer."""
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(os.path.join(ROOT, app_path), default_timeout=300)
+    app.session_state["password_correct"] = True
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"{app_path} raised: {[e.value for e in app.exception]}")
+
+    def submit():
+        # The chat pages ask in a text area, the report page in a text input.
+        (app.text_area or app.text_input)[0].input(query)
+        app.button[0].click()
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"{app_path} raised: {[e.value for e in app.exception]}")
+    return submit
+
+
+def run(args, cache_dir):
+    from openai import OpenAI
+    from helper_functions import scrape_cache, sources, report_cache, retrieval, chunking, refresher
+    from benchmarks.fake_openai import FakeOpenAI
+    from benchmarks.stub_server import StubServer
+    from benchmarks.fixtures import make_html_page, make_report_pdf
+
+    with FakeOpenAI(latency=args.latency, per_token_latency=args.per_token_latency) as fake, \
+            StubServer(default_delay=args.page_delay) as stub:
+        os.environ["OPENAI_BASE_URL"] = fake.base_url
+        os.environ["OPENAI_API_KEY"] = "test"
+        client = OpenAI(base_url=fake.base_url, api_key="test")
+
+        # Point both corpora and the report at the fixtures on the stub server.
+        for offset, corpus in enumerate(sources.CORPORA.values()):
+            corpus['urls'] = [
+                stub.add_file(f"page{offset}-{i}.html", make_html_page(offset * args.pages + i).encode(),
+                              "text/html; charset=utf-8")
+                for i in range(args.pages)
+            ]
+        if args.pdf:
+            with open(args.pdf, "rb") as f:
+                pdf_bytes = f.read()
+        else:
+            pdf_bytes = make_report_pdf(args.report_pages)
+        sources.REPORTS["sdfe_2023"] = stub.add_file("report.pdf", pdf_bytes, "application/pdf")
+
+        corpus = sources.CORPORA['career_guidance']
+        results, state = [], {}
+
+        def scrape(i):
+            # A fresh cache database per run, so every page is fetched and parsed.
+            db_path = os.path.join(cache_dir, f"scrape-{i}.sqlite3")
+
+            def call():
+                pages = scrape_cache.get_parsed_many(corpus['urls'], corpus['parse'], corpus['parser_key'],
+                                                     db_path=db_path)
+                state['pages'] = [dict(page, url=url) for url, page in zip(corpus['urls'], pages)]
+            return call
+
+        def extract_pdf(i):
+            def call():
+                state['report_pages'] = report_cache.extract_pages(pdf_bytes)
+            return call
+
+        def chunk(i):
+            def call():
+                state['chunks'] = retrieval.corpus_chunks(state['pages']) + list(chunking.chunk_pages(
+                    state['report_pages'], max_tokens=report_cache.CHUNK_TOKENS,
+                    overlap_tokens=report_cache.CHUNK_OVERLAP_TOKENS))
+            return call
+
+        def embed_index(i):
+            def call():
+                state['index'] = retrieval.build_index(client, state['chunks'])
+            return call
+
+        def retrieve(i):
+            return lambda: retrieval.retrieve(client, state['index'], make_query(i))
+
+        results.append(measure_stage("scrape", scrape, fake, args.repeat, items=len(corpus['urls'])))
+        results.append(measure_stage("extract_pdf", extract_pdf, fake, args.repeat,
+                                     items=lambda: len(state['report_pages'])))
+        results.append(measure_stage("chunk", chunk, fake, args.repeat,
+                                     items=lambda: len(state['pages']) + len(state['report_pages'])))
+        results.append(measure_stage("embed_index", embed_index, fake, args.repeat,
+                                     items=lambda: len(state['chunks'])))
+        results.append(measure_stage("retrieve", retrieve, fake, args.repeat))
+
+        # The pages read index snapshots; build them once, as the background refresher would.
+        refresher.refresh_all(client)
+        for name, app_path in PAGE_APPS.items():
+            results.append(measure_stage(
+                name, lambda i, app_path=app_path: run_page_query(app_path, make_query(100 + i)), fake, args.repeat))
+    return results
+
+
+def report(results):
+    print(f"{'stage':24s} {'p50 s':>8s} {'p95 s':>8s} {'items/s':>9s} {'prompt tok':>11s} "
+          f"{'compl tok':>10s} {'peak MB':>8s}")
+    for r in results:
+        print(f"{r['stage']:24s} {r['p50']:8.3f} {r['p95']:8.3f} {r['throughput']:9.1f} "
+              f"{r['prompt_tokens']:11.0f} {r['completion_tokens']:10.0f} {r['peak_mb']:8.1f}")
+
+
+def regressions(results, baseline, tolerance):
+    """Returns a description of every stage whose p95, tokens or peak memory grew past `tolerance`."""
+    previous = {r['stage']: r for r in baseline}
+    found = []
+    for r in results:
+        before = previous.get(r['stage'])
+        if before is None:
+            continue
+        for key in ('p95', 'prompt_tokens', 'completion_tokens', 'peak_mb'):
+            # Ignore tiny absolute values, where noise dominates the ratio.
+            floor = {'p95': 0.01, 'peak_mb': 1.0}.get(key, 10)
+            if r[key] > max(before[key], floor) * (1 + tolerance):
+                found.append(f"{r['stage']} {key}: {before[key]:.3f} -> {r[key]:.3f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG pipeline benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage (after one warm-up)")
+    parser.add_argument("--pages", type=int, default=12, help="fixture HTML pages per corpus")
+    parser.add_argument("--report-pages", type=int, default=20, help="pages of the synthetic report PDF")
+    parser.add_argument("--pdf", help="use this report PDF instead of the synthetic one")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake OpenAI latency per request, seconds")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="fake OpenAI latency per token")
+    parser.add_argument("--page-delay", type=float, default=0.0, help="stub server latency per request, seconds")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Everything the portal caches goes to a throwaway directory, and answers are never
+        # served from the semantic answer cache, so each run measures the full work.
+        os.environ["PORTAL_CACHE_DIR"] = cache_dir
+        os.environ["ANSWER_CACHE_THRESHOLD"] = "2"
+        os.chdir(ROOT)
+        results = run(args, cache_dir)
+
+    report(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        if found:
+            print("\nRegressions over the baseline:\n  " + "\n  ".join(found))
+            return 1
+        print(f"\nNo stage regressed by more than {args.tolerance:.0%} over the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# """
+# Startup-time audit of the portal pages. Every page script is run with
+# Streamlit's AppTest in a fresh interpreter (so nothing is already imported),
+# once as the login screen and, for Main_Portal.py, once logged in as the
+# landing page. Reports the time to first paint (the first complete script
+# run) over a bare Streamlit page, and the slowest imports the page pulls in,
+# from `python -X importtime`.
+#
+# Exits non-zero if the login screen or the landing page misses its target.
+#
+#   python benchmarks/bench_startup.py --repeat 3
+# """
+
+PAGES = ["Main_Portal.py"] + sorted(os.path.join("pages", name) for name in os.listdir(os.path.join(ROOT, "pages"))
+                                    if name.endswith(".py"))
+LANDING_PAGE = "Main_Portal.py"
+
+# Seconds over a bare Streamlit page (same interpreter start-up and AppTest run).
+LOGIN_TARGET_SECONDS = 0.25
+LANDING_TARGET_SECONDS = 0.5
+
+_MARKER = "[bench_startup] streamlit imported"
+_BARE_PAGE = 'import streamlit as st\nst.title("Bare page")\nst.text_input("Password", type="password")\n'
+
+
+def _child(script, logged_in):
+    # Runs in the fresh interpreter: import Streamlit first so only the page's own imports are profiled.
+    from streamlit.testing.v1 import AppTest
+    print(_MARKER, file=sys.stderr, flush=True)
+
+    app = AppTest.from_file(script, default_timeout=120)
+    if logged_in:
+        app.session_state["password_correct"] = True
+    started = time.perf_counter()
+    app.run()
+    seconds = time.perf_counter() - started
+    errors = [str(e.value) for e in app.exception]
+    print(json.dumps({'seconds': seconds, 'errors': errors}), flush=True)
+
+
+def _top_imports(stderr, count):
+    # `-X importtime` lines: "import time: <self us> | <cumulative us> | <indented module name>".
+    # Only top-level imports made by the page (after Streamlit was imported) are kept.
+    lines = stderr.splitlines()
+    if _MARKER in lines:
+        lines = lines[lines.index(_MARKER) + 1:]
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        if name.startswith("  "):
+            continue
+        imports.append((int(fields[1]) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def run_page(script, logged_in, cache_dir, top=5):
+    """Runs `script` in a fresh interpreter; returns (seconds, top imports)."""
+    env = dict(os.environ, PORTAL_CACHE_DIR=cache_dir, PYTHONDONTWRITEBYTECODE="1")
+    command = [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", script]
+    if logged_in:
+        command.append("--logged-in")
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    result_lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+    if completed.returncode or not result_lines:
+        raise RuntimeError(f"{script} failed to start:\n{completed.stderr[-2000:]}")
+    result = json.loads(result_lines[-1])
+    if result['errors']:
+        raise RuntimeError(f"{script} raised: {result['errors']}")
+    return result['seconds'], _top_imports(completed.stderr, top)
+
+
+def measure(script, logged_in, cache_dir, repeat, top):
+    runs = [run_page(script, logged_in, cache_dir, top) for _ in range(repeat)]
+    # The median run, with the import profile of that same run.
+    return sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal startup-time audit")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per page; the median is reported")
+    parser.add_argument("--top", type=int, default=5, help="slowest imports listed per page")
+    parser.add_argument("--login-target", type=float, default=LOGIN_TARGET_SECONDS)
+    parser.add_argument("--landing-target", type=float, default=LANDING_TARGET_SECONDS)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--logged-in", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.logged_in)
+        return 0
+
+    misses = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        bare_path = os.path.join(cache_dir, "bare_page.py")
+        with open(bare_path, "w", encoding="utf-8") as f:
+            f.write(_BARE_PAGE)
+        baseline, _ = measure(bare_path, False, cache_dir, args.repeat, args.top)
+        print(f"bare Streamlit page: {baseline:.3f}s to first paint (median of {args.repeat})\n")
+
+        runs = [(page, False, args.login_target) for page in PAGES] + [(LANDING_PAGE, True, args.landing_target)]
+        for page, logged_in, target in runs:
+            seconds, imports = measure(page, logged_in, cache_dir, args.repeat, args.top)
+            overhead = seconds - baseline
+            screen = "landing page" if logged_in else "login screen"
+            verdict = "ok" if overhead <= target else "MISSED"
+            print(f"{page} ({screen}): {seconds:.3f}s, +{overhead:.3f}s over bare (target +{target:.2f}s) {verdict}")
+            for cumulative, name in imports:
+                print(f"    {cumulative:7.3f}s  import {name}")
+            if overhead > target:
+                misses.append(f"{page} ({screen})")
+
+    print()
+    if misses:
+        print(f"Missed the time-to-first-paint target: {', '.join(misses)}")
+        return 1
+    print("Login screens and landing page within their time-to-first-paint targets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import json
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+# """
+# Fake OpenAI-compatible API for offline benchmarks. Point a client at it with
+# OpenAI(base_url=server.base_url, api_key="test").
+#
+#   POST /v1/embeddings         deterministic bag-of-words vectors
+#   POST /v1/chat/completions   canned "Step 1:#### ... Step 3:#### answer"
+#                               replies, streamed as SSE when stream=true
+#
+# Latency is `latency + per_token_latency * tokens`. Every `fail_every`-th
+# request is answered with 429 (and a Retry-After header) to exercise retries.
+# """
+
+DIMENSIONS = 256
+
+
+def embed_text(text, dimensions=DIMENSIONS):
+    """Deterministic stand-in embedding: hashed word counts, unit length."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in text.lower().split():
+        word = word.strip(".,;:!?()'\"")
+        if word:
+            vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def canned_reply(messages, words=120):
+    """Returns a reply in the Step 1/2/3 format the portal prompts ask for."""
+    query = messages[-1]['content'] if messages else ""
+    body = " ".join(f"point{i}" for i in range(words))
+    return (f"Step 1:#### The user asked {query[:60]!r}.\nStep 2:#### Relevant details were found.\n"
+            f"Step 3:#### Here is a helpful answer. {body}")
+
+
+class FakeOpenAI:
+    """Runs the fake API on localhost; use as a context manager."""
+
+    def __init__(self, latency=0.05, per_token_latency=0.0, fail_every=0, reply_words=120, port=0):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.fail_every = fail_every
+        self.reply_words = reply_words
+        self.requests = 0
+        self.usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                fake._handle(self)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handle(self, request):
+        length = int(request.headers.get("Content-Length", 0))
+        payload = json.loads(request.rfile.read(length) or b"{}")
+        with self._lock:
+            self.requests += 1
+            count = self.requests
+        if self.fail_every and count % self.fail_every == 0:
+            return self._send_json(request, 429, {'error': {'message': "Rate limit reached", 'type': "requests"}},
+                                   {'Retry-After': "0.05"})
+
+        if request.path.endswith("/embeddings"):
+            inputs = payload['input'] if isinstance(payload['input'], list) else [payload['input']]
+            tokens = sum(len(text.split()) for text in inputs)
+            self._sleep(tokens)
+            self._count(tokens, 0)
+            return self._send_json(request, 200, {
+                'object': "list",
+                'model': payload.get('model'),
+                'data': [{'object': "embedding", 'index': i, 'embedding': embed_text(text)} for i, text in enumerate(inputs)],
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+            })
+
+        if request.path.endswith("/chat/completions"):
+            messages = payload.get('messages', [])
+            prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in messages)
+            reply = canned_reply(messages, self.reply_words)
+            pieces = [word + " " for word in reply.split(" ")]
+            self._count(prompt_tokens, len(pieces))
+            if payload.get('stream'):
+                return self._stream_chat(request, payload, pieces)
+            self._sleep(len(pieces))
+            return self._send_json(request, 200, {
+                'id': "chatcmpl-fake", 'object': "chat.completion", 'created': int(time.time()),
+                'model': payload.get('model'),
+                'choices': [{'index': 0, 'finish_reason': "stop",
+                             'message': {'role': "assistant", 'content': reply}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(pieces),
+                          'total_tokens': prompt_tokens + len(pieces)},
+            })
+
+        return self._send_json(request, 404, {'error': {'message': "not found"}})
+
+    def _sleep(self, tokens):
+        time.sleep(self.latency + self.per_token_latency * tokens)
+
+    def _count(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.usage['prompt_tokens'] += prompt_tokens
+            self.usage['completion_tokens'] += completion_tokens
+
+    def _send_json(self, request, status, body, headers=None):
+        data = json.dumps(body).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _stream_chat(self, request, payload, pieces):
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Connection", "close")
+        request.end_headers()
+        time.sleep(self.latency)
+        for piece in pieces:
+            time.sleep(self.per_token_latency)
+            chunk = {'id': "chatcmpl-fake", 'object': "chat.completion.chunk", 'created': int(time.time()),
+                     'model': payload.get('model'),
+                     'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+            request.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            request.wfile.flush()
+        done = {'id': "chatcmpl-fake", 'object': "chat.completion.chunk", 'created': int(time.time()),
+                'model': payload.get('model'), 'choices': [{'index': 0, 'delta': {}, 'finish_reason': "stop"}]}
+        request.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+        request.wfile.flush()
+        request.close_connection = True
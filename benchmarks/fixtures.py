@@ -0,0 +1,78 @@
+# """
+# Synthetic fixtures for the offline benchmarks: a minimal PDF writer (no
+# third-party dependency) and report-like page text.
+# """
+
+SECTIONS = [
+    "Digital Economy", "Green Economy", "Care Economy", "Generative AI", "Sustainability Reporting",
+    "Workplace Safety", "Data Analytics", "Customer Experience", "Supply Chain", "Cybersecurity",
+]
+
+
+def report_lines(page_number, lines_per_page=40):
+    """Returns plausible report lines for one page, with a heading every few pages."""
+    section = SECTIONS[(page_number // 5) % len(SECTIONS)]
+    lines = []
+    if page_number % 5 == 0:
+        lines.append(f"{page_number // 5 + 1}. {section}")
+    for line in range(lines_per_page - len(lines)):
+        lines.append(
+            f"Demand for {section.lower()} skills grew steadily, and employers in sector {line % 7} "
+            f"reported hiring for roles that need them. Workers can pivot by taking modular courses."
+        )
+    return lines
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """Builds a PDF (bytes) with one page per list of text lines."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font_ref = 3 + 2 * len(pages)
+    for i, lines in enumerate(pages):
+        stream = "BT /F1 9 Tf 40 760 Td 11 TL " + " ".join(f"({_escape(line[:110])}) '" for line in lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 {font_ref} 0 R >> >> /Contents {4 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def make_report_pdf(page_count=60):
+    """Builds a synthetic multi-section report PDF."""
+    return make_pdf([report_lines(page) for page in range(page_count)])
+
+
+def make_html_page(page_number, sections=6, paragraphs=4):
+    """Returns a content page wrapped in typical site chrome (menus, cookie banner, footer)."""
+    menu = "".join(f"<li><a href='/s{i}'>{name}</a></li>" for i, name in enumerate(SECTIONS))
+    body = []
+    for s in range(sections):
+        section = SECTIONS[(page_number + s) % len(SECTIONS)]
+        body.append(f"<h2 id='sec-{s}'>{s + 1}. {section}</h2>")
+        body.extend(f"<p>{line}</p>" for line in report_lines(page_number + s, paragraphs))
+        body.append("<ul>" + "".join(f"<li>Course {k} in {section.lower()}</li>" for k in range(3)) + "</ul>")
+    return f"""<!DOCTYPE html><html><head><title>Guide {page_number}</title>
+<style>body {{ font-family: sans-serif; }}</style><script>window.dataLayer = [];</script></head><body>
+<div class="cookie-consent"><p>We use cookies to improve your experience on our website.</p><button>Accept</button></div>
+<header><h1>MySkillsFuture</h1><nav><ul>{menu}</ul></nav></header>
+<div class="breadcrumb"><ul><li>Home</li><li>Career Resources</li><li>Guide {page_number}</li></ul></div>
+<main><article><h1>Career guide {page_number}</h1>{''.join(body)}</article>
+<div class="share-bar"><ul><li>Share on Facebook</li><li>Share on LinkedIn</li></ul></div></main>
+<aside><h3>Related articles</h3><ul>{menu}</ul></aside>
+<footer><ul>{menu}</ul><p>Copyright Government of Singapore. Report Vulnerability. Privacy Statement.</p></footer>
+</body></html>"""
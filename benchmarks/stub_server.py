@@ -0,0 +1,93 @@
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# """
+# Local stub HTTP server for exercising the fetch engine and scrape cache
+# without touching the real government sites.
+#
+#   /page/<name>?delay=0.2        HTML page, served after `delay` seconds
+#   /flaky/<name>?fail=2          503 for the first `fail` requests, then 200
+#   /file/<name>                  bytes registered with `StubServer.add_file`
+#
+# Every 200 response carries an ETag, and a matching If-None-Match gets a 304.
+# """
+
+
+class StubServer:
+    """Runs a threaded stub server on localhost; use as a context manager."""
+
+    def __init__(self, port=0, default_delay=0.0):
+        self.default_delay = default_delay
+        self.files = {}
+        self.hits = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub._handle(self)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def add_file(self, name, body, content_type="application/octet-stream"):
+        self.files[name] = (body, content_type)
+        return self.url(f"file/{name}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handle(self, request):
+        path, _, query = request.path.partition("?")
+        params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+        with self._lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+            hits = self.hits[path]
+
+        time.sleep(float(params.get("delay", self.default_delay)))
+        kind, _, name = path.lstrip("/").partition("/")
+
+        if kind == "flaky" and hits <= int(params.get("fail", 1)):
+            return self._send(request, 503, b"try again", "text/plain")
+        if kind in ("page", "flaky"):
+            body = (f"<html><head><title>{name}</title></head><body><nav><a href='/'>Home</a></nav>"
+                    f"<h1>{name}</h1><p>Stub paragraph for {name}.</p><ul><li>Point one</li></ul>"
+                    f"<footer>Footer</footer></body></html>").encode()
+            return self._send(request, 200, body, "text/html; charset=utf-8")
+        if kind == "file" and name in self.files:
+            body, content_type = self.files[name]
+            return self._send(request, 200, body, content_type)
+        return self._send(request, 404, b"not found", "text/plain")
+
+    def _send(self, request, status, body, content_type):
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if status == 200 and request.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        if status in (200, 304):
+            # Lowercase on purpose: header names are case-insensitive, and clients must not depend on "ETag".
+            request.send_header("etag", etag)
+        request.end_headers()
+        request.wfile.write(body)
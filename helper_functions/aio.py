@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+# """
+# One long-lived background event loop per process. Async clients (the fetch
+# session, the async OpenAI client) are created on it once and reused across
+# Streamlit reruns, and page scripts call into it synchronously with `run`.
+# """
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """Returns the shared background event loop, starting it on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="portal-aio-loop", daemon=True).start()
+    return _loop
+
+
+def run(coroutine, timeout=None):
+    """Runs `coroutine` on the shared loop and blocks until it returns."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result(timeout)
+
+
+def is_running():
+    """Returns `True` if the shared loop has been started."""
+    return _loop is not None
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from helper_functions import scrape_cache, tracing
+
+# """
+# Semantic answer cache. Final answers are stored with the query embedding and
+# the version (hash) of the corpus index they were generated from; a new query
+# whose embedding is close enough to a stored one gets the stored answer.
+# Entries for an outdated corpus version are dropped, and each namespace is
+# capped with least-recently-used eviction.
+# """
+
+DB_PATH = os.path.join(scrape_cache.CACHE_DIR, "answer_cache.sqlite3")
+DEFAULT_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))
+MAX_ENTRIES_PER_NAMESPACE = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 500))
+MAX_MATRICES_IN_MEMORY = 16
+
+_lock = threading.Lock()
+# (namespace, corpus_version) -> (ids, matrix), rebuilt after writes; least recently used dropped first.
+_matrices = OrderedDict()
+
+
+def _connect(db_path=None):
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            corpus_version TEXT NOT NULL,
+            query TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            answer TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS answers_namespace ON answers (namespace, corpus_version)")
+    return conn
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _invalidate_memo(namespace):
+    with _lock:
+        for key in [key for key in _matrices if key[0] == namespace]:
+            del _matrices[key]
+
+
+def _load_matrix(conn, namespace, corpus_version):
+    key = (namespace, corpus_version)
+    with _lock:
+        if key in _matrices:
+            _matrices.move_to_end(key)
+            return _matrices[key]
+    # Exact-text entries (stored without an embedding) are only found by `lookup_query`.
+    rows = conn.execute(
+        "SELECT id, embedding FROM answers WHERE namespace = ? AND corpus_version = ? AND length(embedding) > 0",
+        (namespace, corpus_version)
+    ).fetchall()
+    ids = [row[0] for row in rows]
+    matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+    with _lock:
+        _matrices[key] = (ids, matrix)
+        while len(_matrices) > MAX_MATRICES_IN_MEMORY:
+            _matrices.popitem(last=False)
+    return ids, matrix
+
+
+def invalidate(namespace, keep_version=None, db_path=None):
+    """Drops cached answers for `namespace`, except those for `keep_version`."""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM answers WHERE namespace = ? AND corpus_version != ?",
+                         (namespace, keep_version or ""))
+    finally:
+        conn.close()
+    _invalidate_memo(namespace)
+
+
+def lookup(namespace, corpus_version, query_vector, threshold=DEFAULT_THRESHOLD, db_path=None):
+    """Returns (answer, similarity) for the closest cached query above `threshold`, else (None, best)."""
+    with tracing.span("answer_cache") as cache_span:
+        answer, similarity = _lookup(namespace, corpus_version, query_vector, threshold, db_path)
+        cache_span.add(cache_hits=int(answer is not None), cache_misses=int(answer is None))
+    return answer, similarity
+
+
+def _lookup(namespace, corpus_version, query_vector, threshold, db_path):
+    conn = _connect(db_path)
+    try:
+        ids, matrix = _load_matrix(conn, namespace, corpus_version)
+        if matrix is None or matrix.shape[1] != np.asarray(query_vector).size:
+            return None, 0.0
+        similarities = matrix @ _unit(query_vector)
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < threshold:
+            return None, similarity
+
+        row = conn.execute("SELECT answer FROM answers WHERE id = ?", (ids[best],)).fetchone()
+        if row is None:
+            _invalidate_memo(namespace)
+            return None, similarity
+        with conn:
+            conn.execute("UPDATE answers SET last_used_at = ?, hits = hits + 1 WHERE id = ?", (time.time(), ids[best]))
+        return json.loads(row[0]), similarity
+    finally:
+        conn.close()
+
+
+def lookup_query(namespace, corpus_version, query, db_path=None):
+    """Returns the answer cached for exactly `query` (e.g. a listed example question), or None; no embedding needed."""
+    with tracing.span("answer_cache", exact=True) as cache_span:
+        conn = _connect(db_path)
+        try:
+            row = conn.execute(
+                "SELECT id, answer FROM answers WHERE namespace = ? AND corpus_version = ? AND query = ? "
+                "ORDER BY last_used_at DESC LIMIT 1", (namespace, corpus_version, query)
+            ).fetchone()
+            if row is not None:
+                with conn:
+                    conn.execute("UPDATE answers SET last_used_at = ?, hits = hits + 1 WHERE id = ?", (time.time(), row[0]))
+        finally:
+            conn.close()
+        cache_span.add(cache_hits=int(row is not None), cache_misses=int(row is None))
+    return json.loads(row[1]) if row is not None else None
+
+
+def store(namespace, corpus_version, query, query_vector, answer, max_entries=MAX_ENTRIES_PER_NAMESPACE,
+          db_path=None):
+    """Caches `answer` (JSON-serialisable) for `query` and evicts old or outdated entries.
+
+    With `query_vector=None` the entry is exact-text only: `lookup_query` finds it, `lookup` does not.
+    """
+    embedding = _unit(query_vector).tobytes() if query_vector is not None else b""
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        with conn:
+            # Answers built from an older corpus version may now be wrong.
+            conn.execute("DELETE FROM answers WHERE namespace = ? AND corpus_version != ?", (namespace, corpus_version))
+            conn.execute(
+                "INSERT INTO answers (namespace, corpus_version, query, embedding, answer, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, corpus_version, query, embedding, json.dumps(answer), now, now),
+            )
+            conn.execute("""
+                DELETE FROM answers WHERE namespace = ? AND id NOT IN (
+                    SELECT id FROM answers WHERE namespace = ? ORDER BY last_used_at DESC LIMIT ?
+                )""", (namespace, namespace, max_entries))
+    finally:
+        conn.close()
+    _invalidate_memo(namespace)
@@ -0,0 +1,167 @@
+import re
+import sys
+import time
+from collections import deque
+import tiktoken
+
+# """
+# Streaming, token-accurate text chunker. Text is split once into sentence and
+# heading units, every unit is tokenised exactly once, and chunks are packed
+# greedily up to a token budget, so the cost is linear in the input size.
+# Each chunk records where it came from (page number and character offset).
+# """
+
+ENCODING_NAME = "o200k_base"  # tokenizer used by gpt-4o / gpt-4o-mini
+DEFAULT_MAX_TOKENS = 512
+DEFAULT_OVERLAP_TOKENS = 64
+# After a failed vocabulary download, the approximation is used for this long before tiktoken is tried again.
+ENCODING_RETRY_SECONDS = 300
+
+_LINE = re.compile(r"[^\n]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Short lines such as "3. Green Economy" or "KEY FINDINGS" that start a new section.
+_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s+\S.{0,80}|[A-Z][A-Z0-9 &,:'/-]{3,80})$")
+
+
+class ApproximateEncoding:
+    """Word-piece stand-in used when the tiktoken vocabulary cannot be downloaded.
+
+    Pieces are words, single punctuation marks and whitespace runs (whitespace
+    is folded into the next piece), which tracks real BPE counts to within
+    roughly 10-20% on English prose.
+    """
+
+    _PIECES = re.compile(r"\s*(?:\w+|[^\w\s])|\s+")
+
+    name = "approximate"
+
+    def encode(self, text, disallowed_special=()):
+        return self._PIECES.findall(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+_APPROXIMATE = ApproximateEncoding()
+# Only real encodings are cached; a failed download is retried after ENCODING_RETRY_SECONDS.
+_encodings = {}
+_retry_at = {}
+
+
+def get_encoding(name=ENCODING_NAME):
+    """Returns the (cached) tiktoken encoding, or an approximation while it cannot be downloaded."""
+    encoding = _encodings.get(name)
+    if encoding is not None:
+        return encoding
+    if time.monotonic() < _retry_at.get(name, 0.0):
+        return _APPROXIMATE
+    try:
+        encoding = tiktoken.get_encoding(name)
+    except Exception as e:
+        # tiktoken downloads its vocabulary on first use; keep working without it for now.
+        print(f"[chunking] tiktoken encoding {name!r} unavailable ({type(e).__name__}); "
+              f"falling back to approximate token counts for {ENCODING_RETRY_SECONDS}s", file=sys.stderr)
+        _retry_at[name] = time.monotonic() + ENCODING_RETRY_SECONDS
+        return _APPROXIMATE
+    _encodings[name] = encoding
+    return encoding
+
+
+def count_tokens(text, encoding_name=ENCODING_NAME):
+    """Returns the number of tokens in `text`."""
+    return len(get_encoding(encoding_name).encode(text, disallowed_special=()))
+
+
+def is_heading(line):
+    """Returns `True` if a line looks like a section heading."""
+    line = line.strip()
+    return bool(line) and not line.endswith((".", ",", ";")) and bool(_HEADING.match(line))
+
+
+def iter_units(text):
+    """Yields (offset, unit_text, is_heading) for each heading line or sentence in `text`."""
+    for line in _LINE.finditer(text):
+        if is_heading(line.group()):
+            yield line.start(), line.group().strip(), True
+            continue
+        position = line.start()
+        for match in _SENTENCE_END.finditer(text, line.start(), line.end()):
+            unit = text[position:match.start()].strip()
+            if unit:
+                yield position, unit, False
+            position = match.end()
+        unit = text[position:line.end()].strip()
+        if unit:
+            yield position, unit, False
+
+
+def _split_long_unit(encoding, unit, tokens, max_tokens):
+    # A single sentence longer than the budget is cut on token boundaries.
+    for start in range(0, len(tokens), max_tokens):
+        window = tokens[start:start + max_tokens]
+        yield encoding.decode(window), len(window)
+
+
+def chunk_pages(pages, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+                encoding_name=ENCODING_NAME):
+    """Yields chunk dicts for an iterable of page texts (or (page_number, text) pairs).
+
+    Each chunk is {'text', 'tokens', 'page', 'offset', 'end_page'}: `page` and
+    `offset` locate the chunk's first unit in the source. Consecutive chunks
+    share up to `overlap_tokens` of trailing sentences, and a heading always
+    starts a new chunk unless the current one is still nearly empty.
+    """
+    encoding = get_encoding(encoding_name)
+    current = deque()  # (text, tokens, page, offset)
+    current_tokens = 0
+    fresh_units = 0  # units added since the last flush (the rest is overlap)
+
+    def flush():
+        nonlocal current_tokens, fresh_units
+        chunk = {
+            'text': " ".join(unit[0] for unit in current),
+            'tokens': current_tokens,
+            'page': current[0][2],
+            'offset': current[0][3],
+            'end_page': current[-1][2],
+        }
+        # Keep trailing units as overlap for the next chunk.
+        kept, kept_tokens = deque(), 0
+        while current and kept_tokens + current[-1][1] <= overlap_tokens:
+            unit = current.pop()
+            kept.appendleft(unit)
+            kept_tokens += unit[1]
+        current.clear()
+        current.extend(kept)
+        current_tokens, fresh_units = kept_tokens, 0
+        return chunk
+
+    for page_number, page in enumerate(pages, 1):
+        if isinstance(page, tuple):
+            page_number, page = page
+        for offset, unit, heading in iter_units(page):
+            tokens = encoding.encode(unit, disallowed_special=())
+            pieces = [(unit, len(tokens))] if len(tokens) <= max_tokens else \
+                _split_long_unit(encoding, unit, tokens, max_tokens)
+            for piece, piece_tokens in pieces:
+                if heading and fresh_units and current_tokens > max_tokens // 4:
+                    yield flush()
+                    # A new section should not open with the previous section's tail.
+                    current.clear()
+                    current_tokens = 0
+                elif fresh_units and current_tokens + piece_tokens > max_tokens:
+                    yield flush()
+                while current and current_tokens + piece_tokens > max_tokens:
+                    current_tokens -= current.popleft()[1]
+                current.append((piece, piece_tokens, page_number, offset))
+                current_tokens += piece_tokens
+                fresh_units += 1
+
+    if fresh_units:
+        yield flush()
+
+
+def chunk_text(text, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+               encoding_name=ENCODING_NAME):
+    """Returns the chunks of a single text as a list (see `chunk_pages`)."""
+    return list(chunk_pages([text], max_tokens, overlap_tokens, encoding_name))
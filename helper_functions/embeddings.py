@@ -0,0 +1,188 @@
+import sys
+import math
+import time
+import random
+import asyncio
+import threading
+import numpy as np
+import openai
+from helper_functions import aio, chunking
+
+# """
+# Batched, rate-limit-aware embedding client. Inputs are packed into requests
+# up to the API's per-request item and token limits (counted with tiktoken),
+# several requests run concurrently within a requests/tokens-per-minute
+# budget, and 429/5xx/connection errors are retried with backoff.
+# """
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# text-embedding-3-* models use cl100k_base.
+ENCODING_NAME = "cl100k_base"
+
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 300_000
+MAX_INPUT_TOKENS = 8191
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 3000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+# The API's Retry-After is honoured up to this many seconds; a query or index build never waits longer per retry.
+MAX_RETRY_AFTER = 5
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared by concurrent batches."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.capacity = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.available = dict(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        for kind, capacity in self.capacity.items():
+            self.available[kind] = min(capacity, self.available[kind] + capacity * elapsed / 60)
+
+    async def acquire(self, tokens):
+        # A batch larger than the whole minute budget is let through once the bucket is full.
+        tokens = min(tokens, self.capacity['tokens'])
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.available['requests'] >= 1 and self.available['tokens'] >= tokens:
+                    self.available['requests'] -= 1
+                    self.available['tokens'] -= tokens
+                    return
+                wait = max(
+                    (1 - self.available['requests']) * 60 / self.capacity['requests'],
+                    (tokens - self.available['tokens']) * 60 / self.capacity['tokens'],
+                )
+                await asyncio.sleep(max(wait, 0.01))
+
+
+def async_client_for(client=None, max_retries=0):
+    """Returns a shared AsyncOpenAI client using the same key and base URL as `client`.
+
+    Used on the shared event loop. The SDK's own retries are disabled by
+    default because embedding retries are handled here; pass `max_retries`
+    for other callers such as chat completions.
+    """
+    api_key = getattr(client, 'api_key', None)
+    base_url = str(client.base_url) if client is not None else None
+    key = (api_key, base_url, max_retries)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+        return _clients[key]
+
+
+def clear_async_clients():
+    """Forgets the shared AsyncOpenAI clients, e.g. after the API key changed."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def pack_batches(token_counts, max_items=MAX_BATCH_ITEMS, max_tokens=MAX_BATCH_TOKENS):
+    """Groups input positions into batches that respect the per-request limits."""
+    batches, current, current_tokens = [], [], 0
+    for position, tokens in enumerate(token_counts):
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(position)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_delay(error, attempt, backoff):
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = None
+    # "inf", "nan" and negative values are ignored.
+    if delay is not None and math.isfinite(delay) and delay >= 0:
+        return min(delay, MAX_RETRY_AFTER)
+    return backoff * (2 ** attempt) * (0.5 + random.random())
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+async def _embed_batch(client, texts, tokens, model, limiter, semaphore, retries, backoff, stats):
+    for attempt in range(retries + 1):
+        await limiter.acquire(tokens)
+        try:
+            async with semaphore:
+                response = await client.embeddings.create(input=texts, model=model)
+            stats['requests'] += 1
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except openai.OpenAIError as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            stats['retries'] += 1
+            await asyncio.sleep(_retry_delay(e, attempt, backoff))
+
+
+async def embed_texts_async(texts, client=None, model=EMBEDDING_MODEL, concurrency=DEFAULT_CONCURRENCY,
+                            requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                            tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                            max_batch_items=MAX_BATCH_ITEMS, max_batch_tokens=MAX_BATCH_TOKENS,
+                            retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, stats=None):
+    """Embeds `texts` in batches; returns a float32 matrix with one row per text, in order."""
+    stats = {} if stats is None else stats
+    stats.update({'inputs': len(texts), 'tokens': 0, 'requests': 0, 'retries': 0, 'batches': 0})
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    encoding = chunking.get_encoding(ENCODING_NAME)
+    encoded = [encoding.encode(text, disallowed_special=()) for text in texts]
+    # Over-long inputs would be rejected outright; embed their first MAX_INPUT_TOKENS instead.
+    texts = [encoding.decode(tokens[:MAX_INPUT_TOKENS]) if len(tokens) > MAX_INPUT_TOKENS else text
+             for text, tokens in zip(texts, encoded)]
+    token_counts = [min(len(tokens), MAX_INPUT_TOKENS) for tokens in encoded]
+
+    batches = pack_batches(token_counts, max_batch_items, max_batch_tokens)
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    client = client if isinstance(client, openai.AsyncOpenAI) else async_client_for(client)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        _embed_batch(client, [texts[i] for i in batch], sum(token_counts[i] for i in batch), model,
+                     limiter, semaphore, retries, backoff, stats)
+        for batch in batches
+    ])
+    elapsed = time.perf_counter() - started
+
+    vectors = [None] * len(texts)
+    for batch, embeddings in zip(batches, results):
+        for position, embedding in zip(batch, embeddings):
+            vectors[position] = embedding
+
+    stats.update({
+        'tokens': sum(token_counts),
+        'batches': len(batches),
+        'seconds': elapsed,
+        'tokens_per_sec': sum(token_counts) / elapsed if elapsed > 0 else 0.0,
+    })
+    print(f"[embeddings] {len(texts)} inputs, {stats['tokens']} tokens in {stats['batches']} batches, "
+          f"{stats['retries']} retries, {elapsed:.2f}s ({stats['tokens_per_sec']:.0f} tokens/sec)", file=sys.stderr)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def embed_texts(texts, client=None, **kwargs):
+    """Blocking wrapper around `embed_texts_async` for page scripts and the CLI."""
+    return aio.run(embed_texts_async(list(texts), client, **kwargs))
@@ -0,0 +1,149 @@
+import sys
+import time
+import random
+import asyncio
+import atexit
+from urllib.parse import urlsplit
+import aiohttp
+import requests
+from multidict import CIMultiDict
+from helper_functions import aio
+
+# """
+# Shared HTTP fetch engine for the scrapers and the report downloader.
+# All requests run on the shared background event loop (see aio.py), which
+# owns a single pooled aiohttp session, so keep-alive connections survive
+# Streamlit reruns.
+# """
+
+MAX_CONNECTIONS = 32
+DEFAULT_PER_HOST_LIMIT = 4
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+# A server's Retry-After is honoured up to this many seconds, so one slow host cannot stall a whole batch.
+MAX_RETRY_AFTER = 10
+USER_AGENT = "Mozilla/5.0 (compatible; CareerGuidancePortal/1.0)"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+
+
+class FetchError(requests.exceptions.RequestException):
+    """Raised when a URL could not be fetched after all retries."""
+
+
+async def _get_session():
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=60, ttl_dns_cache=300)
+        _session = aiohttp.ClientSession(connector=connector, headers={'User-Agent': USER_AGENT})
+    return _session
+
+
+@atexit.register
+def close():
+    """Closes the shared session so pooled connections are released cleanly."""
+    if aio.is_running() and _session is not None and not _session.closed:
+        aio.run(_session.close(), timeout=5)
+
+
+def _retry_delay(attempt, backoff, response_headers=None):
+    retry_after = (response_headers or {}).get('Retry-After')
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_RETRY_AFTER)
+    return backoff * (2 ** attempt) * (0.5 + random.random())
+
+
+async def _fetch_one(session, url, headers, semaphore, timeout, retries, backoff):
+    # `elapsed` is time spent on the wire (all attempts), excluding time queued for a host slot.
+    # `headers` stay case-insensitive: servers send "ETag", "Etag" or "etag" alike.
+    result = {'url': url, 'status': None, 'body': None, 'headers': CIMultiDict(), 'elapsed': 0.0, 'attempts': 0,
+              'error': None}
+
+    for attempt in range(retries + 1):
+        result['attempts'] = attempt + 1
+        response_headers = None
+        started = None
+        try:
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    result['status'] = response.status
+                    result['headers'] = CIMultiDict(response.headers)
+                    response_headers = result['headers']
+                    if response.status not in RETRY_STATUSES:
+                        result['body'] = await response.read()
+                        result['error'] = None if response.status < 400 or response.status == 304 else f"HTTP {response.status}"
+                        break
+                    result['error'] = f"HTTP {response.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result['error'] = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        finally:
+            if started is not None:
+                result['elapsed'] += time.perf_counter() - started
+
+        if attempt < retries:
+            await asyncio.sleep(_retry_delay(attempt, backoff, response_headers))
+
+    return result
+
+
+async def fetch_all_async(urls, headers=None, per_host_limit=DEFAULT_PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT,
+                          retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Fetches `urls` concurrently and returns one result dict per URL, in input order."""
+    headers = headers or {}
+    session = await _get_session()
+    host_limits = {}
+    tasks = []
+    for url in urls:
+        host = urlsplit(url).netloc
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(per_host_limit)
+        tasks.append(_fetch_one(session, url, headers.get(url), host_limits[host], timeout, retries, backoff))
+    return await asyncio.gather(*tasks)
+
+
+def fetch_all(urls, headers=None, per_host_limit=DEFAULT_PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT,
+              retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Blocking wrapper around `fetch_all_async` for use from page scripts.
+
+    `headers` optionally maps a URL to extra request headers for that URL.
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    coroutine = fetch_all_async(urls, headers, per_host_limit, timeout, retries, backoff)
+    # Every request carries its own timeout, so the batch always completes.
+    return aio.run(coroutine)
+
+
+def fetch(url, headers=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Fetches a single URL and returns its body, raising `FetchError` on failure."""
+    result = fetch_all([url], {url: headers} if headers else None, timeout=timeout, retries=retries, backoff=backoff)[0]
+    raise_for_result(result)
+    return result['body']
+
+
+def raise_for_result(result):
+    """Raises `FetchError` if a fetch result is an error."""
+    if result['error']:
+        raise FetchError(f"{result['url']}: {result['error']} after {result['attempts']} attempt(s)")
+
+
+def latency_report(results):
+    """Formats a per-URL latency table for a list of fetch results."""
+    lines = [f"{'status':>6} {'attempts':>8} {'seconds':>8} {'bytes':>9}  url"]
+    for result in sorted(results, key=lambda r: r['elapsed'], reverse=True):
+        size = len(result['body']) if result['body'] is not None else 0
+        lines.append(f"{str(result['status']):>6} {result['attempts']:>8} {result['elapsed']:>8.3f} {size:>9}  {result['url']}")
+    if results:
+        lines.append(f"slowest {max(r['elapsed'] for r in results):.3f}s, "
+                     f"sum of requests {sum(r['elapsed'] for r in results):.3f}s")
+    return "\n".join(lines)
+
+
+def log_latency_report(results, label="fetch"):
+    """Writes the latency table to stderr so it lands in the Streamlit server log."""
+    print(f"[{label}]\n{latency_report(results)}", file=sys.stderr)
@@ -0,0 +1,229 @@
+import re
+from urllib.parse import quote
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    import lxml.etree
+    PARSER = "lxml"
+except ImportError:  # lxml is in requirements.txt; fall back to the stdlib parser without it
+    PARSER = "html.parser"
+
+# """
+# Structured HTML extraction for the scraped corpora. The page is parsed with
+# lxml (BeautifulSoup's html.parser if lxml is missing) and walked once:
+# navigation, headers, footers, cookie banners and similar boilerplate
+# subtrees are skipped, the main content is preferred when the page marks it,
+# and the text is returned as heading-scoped sections, each with a URL anchor
+# pointing back at that part of the source page.
+# """
+
+HEADINGS = frozenset(('h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+BLOCKS = frozenset(('p', 'li', 'dt', 'dd', 'blockquote', 'pre', 'td', 'th', 'figcaption'))
+
+# Elements that never carry page content.
+BOILERPLATE_TAGS = frozenset(('script', 'style', 'noscript', 'template', 'nav', 'header', 'footer', 'aside',
+                              'form', 'iframe', 'svg', 'button', 'select', 'input', 'dialog', 'head'))
+# An article's own <header>/<footer> holds its title and byline, so these are kept inside content.
+CONTENT_TAGS = frozenset(('main', 'article'))
+BOILERPLATE_ROLES = frozenset(('navigation', 'banner', 'contentinfo', 'search', 'dialog', 'alertdialog',
+                               'menu', 'menubar'))
+# Matched against class and id values, as whole dash/underscore-separated words.
+_BOILERPLATE_NAME = re.compile(
+    r"(?:^|[-_\s])(?:cookies?|consent|gdpr|banner|breadcrumbs?|menu|navbar|nav|navigation|footer|masthead|"
+    r"sidebar|social|share|sharing|subscribe|newsletter|skip|modal|popup|toolbar|related|pagination)(?:$|[-_\s])",
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _clean(text):
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class _LxmlDom:
+    """lxml.html tree access used by the walker."""
+
+    MAIN_XPATHS = ("//main", "//*[@role='main']", "//article", "//*[@id='main-content']", "//*[@id='content']",
+                   "//*[contains(concat(' ', normalize-space(@class), ' '), ' main-content ')]")
+
+    @staticmethod
+    def parse(html):
+        if isinstance(html, bytes):
+            # lxml assumes Latin-1 for bytes without a <meta charset>; most pages are UTF-8.
+            try:
+                html = html.decode("utf-8")
+            except UnicodeDecodeError:
+                pass
+        try:
+            return lxml.html.document_fromstring(html)
+        except lxml.etree.ParserError:
+            return None
+        except ValueError:
+            # A str with an XML encoding declaration must be parsed as bytes.
+            return lxml.html.document_fromstring(html.encode("utf-8"))
+
+    @staticmethod
+    def title(document):
+        return document.findtext('.//title') or ""
+
+    @classmethod
+    def main(cls, document):
+        for xpath in cls.MAIN_XPATHS:
+            for element in document.xpath(xpath):
+                if _clean(cls.text(element)):
+                    return element
+        body = document.find('body')
+        return body if body is not None else document
+
+    @staticmethod
+    def children(element):
+        return iter(element)
+
+    @staticmethod
+    def parent(element):
+        return element.getparent()
+
+    @staticmethod
+    def tag(element):
+        # Comments and processing instructions have a non-string tag.
+        return element.tag if isinstance(element.tag, str) else None
+
+    @staticmethod
+    def classes(element):
+        return element.get('class') or ""
+
+    @staticmethod
+    def text(element):
+        return " ".join(element.itertext())
+
+
+class _SoupDom:
+    """BeautifulSoup (html.parser) tree access used by the walker."""
+
+    MAIN_SELECTORS = ("main", "[role=main]", "article", "#main-content", "#content", ".main-content")
+
+    @staticmethod
+    def parse(html):
+        return BeautifulSoup(html, "html.parser")
+
+    @staticmethod
+    def title(document):
+        return document.title.get_text() if document.title else ""
+
+    @classmethod
+    def main(cls, document):
+        for selector in cls.MAIN_SELECTORS:
+            element = document.select_one(selector)
+            if element is not None and _clean(element.get_text(" ")):
+                return element
+        return document.body or document
+
+    @staticmethod
+    def children(element):
+        return iter(element.children)
+
+    @staticmethod
+    def parent(element):
+        return element.parent
+
+    @staticmethod
+    def tag(element):
+        # Strings and comments have no name.
+        return element.name
+
+    @staticmethod
+    def classes(element):
+        classes = element.get('class') or ""
+        return " ".join(classes) if isinstance(classes, list) else classes
+
+    @staticmethod
+    def text(element):
+        return element.get_text(" ")
+
+
+_DOM = _LxmlDom if PARSER == "lxml" else _SoupDom
+
+
+def _is_boilerplate(dom, element):
+    if element.get('role') in BOILERPLATE_ROLES or element.get('aria-hidden') == "true":
+        return True
+    if element.get('hidden') is not None:
+        return True
+    return bool(_BOILERPLATE_NAME.search(f"{dom.classes(element)} {element.get('id') or ''}"))
+
+
+def _iter_content(dom, root):
+    """Yields (tag, element) for the headings and outermost text blocks under `root`, skipping boilerplate."""
+    # A class like "page-with-sidebar" can sit on a wrapper holding most of the page; keep those.
+    half_root = len(dom.text(root)) / 2
+    stack = [(dom.children(root), dom.tag(root) in CONTENT_TAGS)]
+    while stack:
+        children, in_content = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            continue
+        name = dom.tag(child)
+        if name is None:
+            continue
+        if name in BOILERPLATE_TAGS and not (in_content and name in ('header', 'footer')):
+            continue
+        if _is_boilerplate(dom, child) and len(dom.text(child)) <= half_root:
+            continue
+        if name in HEADINGS or name in BLOCKS:
+            # A block's text covers any blocks nested in it (e.g. a <p> inside an <li>).
+            yield name, child
+        else:
+            stack.append((dom.children(child), in_content or name in CONTENT_TAGS))
+
+
+def _anchor(dom, heading):
+    # Prefer an id already in the page (on the heading or a wrapping section); otherwise
+    # a text fragment, which browsers scroll to by matching the heading text.
+    parent = dom.parent(heading)
+    return (heading.get('id') or (parent.get('id') if parent is not None else None)
+            or ":~:text=" + quote(_clean(dom.text(heading))[:100], safe=""))
+
+
+def extract_sections(html, url=None):
+    """Returns {'title', 'sections'} for a page.
+
+    Each section is {'heading', 'level', 'anchor', 'url', 'text'}. Text before
+    the first heading forms a section with the page title as its heading and
+    no anchor. Repeated blocks (e.g. the same call-to-action twice) are kept once.
+    """
+    dom = _DOM
+    document = dom.parse(html)
+    if document is None:
+        return {'title': "", 'sections': []}
+    title = _clean(dom.title(document))
+
+    sections, seen = [], set()
+    current = {'heading': title, 'level': 0, 'anchor': None, 'parts': []}
+    for name, element in _iter_content(dom, dom.main(document)):
+        text = _clean(dom.text(element))
+        if not text:
+            continue
+        if name in HEADINGS:
+            sections.append(current)
+            current = {'heading': text, 'level': int(name[1]), 'anchor': _anchor(dom, element), 'parts': []}
+        elif text not in seen:
+            seen.add(text)
+            current['parts'].append(text)
+    sections.append(current)
+
+    return {
+        'title': title,
+        'sections': [
+            {'heading': s['heading'], 'level': s['level'], 'anchor': s['anchor'],
+             'url': (f"{url}#{s['anchor']}" if s['anchor'] else url) if url else None,
+             'text': "\n".join(s['parts'])}
+            for s in sections if s['parts']
+        ],
+    }
+
+
+def section_text(section):
+    """Returns a section as plain text, heading first."""
+    return f"{section['heading']}\n{section['text']}" if section['heading'] else section['text']
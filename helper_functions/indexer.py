@@ -0,0 +1,87 @@
+import sys
+import numpy as np
+from helper_functions import vector_index
+
+# """
+# Incremental re-indexing. New chunks are matched to the stored index by
+# content hash: unchanged chunks keep their vector row, only added or changed
+# chunks are embedded, and rows whose chunk disappeared are tombstoned
+# ('deleted' in the sidecar) rather than rewritten. Once tombstones make up
+# too much of the matrix the index is compacted.
+# """
+
+# Compact when more than this fraction of rows are tombstones.
+COMPACT_RATIO = 0.25
+
+
+def update_index(name, chunks, embed, model, compact_ratio=COMPACT_RATIO):
+    """Brings index `name` in line with `chunks`, embedding only the delta.
+
+    `embed` maps a list of texts to a matrix of unit-length vectors. Returns
+    (index, stats) where stats counts added, reused, removed and tombstoned rows.
+    """
+    chunks = [dict(chunk, hash=chunk.get('hash') or vector_index.chunk_hash(chunk['text'])) for chunk in chunks]
+    old = vector_index.load_index(name)
+    if old is not None and old['model'] != model:
+        old = None
+
+    rows, vectors = [], []
+    if old is not None:
+        rows = [dict(chunk) for chunk in old['chunks']]
+        vectors = [old['vectors']] if len(old['vectors']) else []
+
+    # Old rows by content hash, live rows first; each can be claimed by one new chunk.
+    # Claiming a tombstone revives it without re-embedding.
+    available = {}
+    for row, chunk in sorted(enumerate(rows), key=lambda item: bool(item[1].get('deleted'))):
+        available.setdefault(chunk['hash'], []).append(row)
+
+    claimed, added = set(), []
+    for chunk in chunks:
+        candidates = available.get(chunk['hash'])
+        if candidates:
+            row = candidates.pop(0)
+            claimed.add(row)
+            # Same content, but its position in the source may have moved.
+            rows[row] = chunk
+        else:
+            added.append(chunk)
+
+    removed = 0
+    for row, chunk in enumerate(rows):
+        if row not in claimed and not chunk.get('deleted'):
+            rows[row] = dict(chunk, deleted=True)
+            removed += 1
+
+    if added:
+        vectors.append(np.asarray(embed([chunk['text'] for chunk in added]), dtype=np.float32))
+        rows.extend(added)
+
+    matrix = np.concatenate(vectors).astype(np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+    tombstones = sum(1 for chunk in rows if chunk.get('deleted'))
+    compacted = bool(rows) and tombstones / len(rows) > compact_ratio
+    if compacted:
+        live = [row for row, chunk in enumerate(rows) if not chunk.get('deleted')]
+        matrix = matrix[live]
+        rows = [rows[row] for row in live]
+        tombstones = 0
+
+    index = {
+        'vectors': matrix,
+        'chunks': rows,
+        'model': model,
+        'hash': vector_index.corpus_hash(chunks, model),
+    }
+    if old is None or old['hash'] != index['hash'] or added or removed or compacted:
+        vector_index.save_index(name, index)
+        index = vector_index.load_index(name) or index
+
+    stats = {
+        'added': len(added),
+        'reused': len(claimed),
+        'removed': removed,
+        'tombstones': tombstones,
+        'compacted': compacted,
+    }
+    print(f"[indexer] {name}: {stats}", file=sys.stderr)
+    return index, stats
@@ -0,0 +1,156 @@
+import os
+import re
+import math
+import posixpath
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, unquote
+import numpy as np
+
+# """
+# BM25 inverted index over the chunks of a vector index. It is built from the
+# chunk texts (plus their section heading and URL path, weighted higher, so a
+# query that names a page like "Level-Up Programme" or "TeSA" finds it) the
+# first time an index version is searched, and kept in memory per version.
+#
+# Postings are stored as flat numpy arrays sorted by term (CSR layout), so a
+# query touches only the postings of its own terms and search cost grows with
+# their length, not with the number of terms in the corpus.
+# """
+
+# Standard BM25 parameters.
+K1 = 1.2
+B = 0.75
+# Heading and URL terms count this many times over body terms.
+HEADING_WEIGHT = 3
+# A lexical hit must contain at least this fraction of the query's terms.
+MIN_TERM_FRACTION = 0.5
+MAX_INDEXES_IN_MEMORY = int(os.getenv("MAX_LEXICAL_INDEXES", 8))
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in into is it its me my of on or our should so that the
+their them there these they this to was we what when where which who why will with you your
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_COMPOUND = re.compile(r"\b[a-z0-9]+(?:[-'][a-z0-9]+)+")
+
+_lock = threading.Lock()
+_indexes = OrderedDict()
+
+
+def tokenize(text):
+    """Returns the lowercase search terms of `text`.
+
+    Hyphenated words yield their parts and the joined form ("level-up" gives
+    "level", "up" and "levelup"), so either spelling matches.
+    """
+    text = text.lower()
+    terms = [word for word in _WORD.findall(text) if word not in STOPWORDS]
+    if "-" in text or "'" in text:
+        terms.extend(compound.replace("-", "").replace("'", "") for compound in _COMPOUND.findall(text))
+    return terms
+
+
+def words(text):
+    """Returns the lowercase words of `text`, stopwords included."""
+    return _WORD.findall(text.lower())
+
+
+def _heading_key(text):
+    # "Level-Up Programme" and "level up programme" name the same heading.
+    return tuple(word for word in words(text) if word not in STOPWORDS)
+
+
+def _url_terms(url):
+    if not url:
+        return []
+    # The last path segments are the page slug, e.g. /level-up-programme or /tesa.
+    segments = unquote(urlsplit(url).path).strip("/").split("/")[-2:]
+    return tokenize(" ".join(posixpath.splitext(segment)[0] for segment in segments).replace("_", " "))
+
+
+class LexicalIndex:
+    """BM25 postings for the rows of one vector index; tombstoned rows are left out."""
+
+    def __init__(self, chunks):
+        self.size = len(chunks)
+        vocabulary = {}
+        # Section headings as term tuples, for exact-heading queries.
+        self.headings = {_heading_key(chunk['heading']) for chunk in chunks
+                         if chunk.get('heading') and not chunk.get('deleted')}
+        self.headings.discard(())
+        # One entry per token occurrence; (term, row) pairs are summed into postings below.
+        term_ids, rows, weights = [], [], []
+        for row, chunk in enumerate(chunks):
+            if chunk.get('deleted'):
+                continue
+            for terms, weight in ((tokenize(chunk['text']), 1),
+                                  (tokenize(chunk.get('heading') or "") + _url_terms(chunk.get('url')), HEADING_WEIGHT)):
+                term_ids.extend([vocabulary.setdefault(term, len(vocabulary)) for term in terms])
+                rows.extend([row] * len(terms))
+                weights.extend([weight] * len(terms))
+
+        rows = np.asarray(rows, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+        # Sorted unique (term, row) keys give the postings grouped by term, rows ascending.
+        keys, inverse = np.unique(np.asarray(term_ids, dtype=np.int64) * max(self.size, 1) + rows,
+                                  return_inverse=True)
+        self.vocabulary = vocabulary
+        self.rows = keys % max(self.size, 1)
+        self.frequencies = np.bincount(inverse, weights=weights).astype(np.float32)
+        self.offsets = np.searchsorted(keys // max(self.size, 1), np.arange(len(vocabulary) + 1))
+        lengths = np.bincount(rows, weights=weights, minlength=self.size).astype(np.float32)
+        live = lengths > 0
+        self.lengths = lengths
+        self.average_length = float(lengths[live].mean()) if live.any() else 1.0
+        document_frequency = np.diff(self.offsets)
+        documents = int(live.sum())
+        self.idf = np.log1p((documents - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+
+    def known(self, terms):
+        """Returns `True` if every term occurs somewhere in the corpus."""
+        return bool(terms) and all(term in self.vocabulary for term in terms)
+
+    def is_heading(self, query):
+        """Returns `True` if `query` names a section heading of the corpus exactly (ignoring case and stopwords)."""
+        return _heading_key(query) in self.headings
+
+    def search(self, query, k=10, min_term_fraction=MIN_TERM_FRACTION):
+        """Returns [(row, score), ...] for the `k` best BM25 matches of `query`, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        term_ids = [self.vocabulary[term] for term in terms if term in self.vocabulary]
+        if not term_ids or self.size == 0:
+            return []
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched = np.zeros(self.size, dtype=np.int32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows, frequencies = self.rows[start:end], self.frequencies[start:end]
+            norm = K1 * (1 - B + B * self.lengths[rows] / self.average_length)
+            scores[rows] += self.idf[term_id] * frequencies * (K1 + 1) / (frequencies + norm)
+            matched[rows] += 1
+
+        candidates = np.nonzero(matched >= math.ceil(min_term_fraction * len(terms)))[0]
+        if len(candidates) == 0:
+            return []
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+def get(index):
+    """Returns the LexicalIndex for a vector index dict, building it on first use of that version."""
+    key = (index['hash'], len(index['chunks']))
+    with _lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+
+    lexical = LexicalIndex(index['chunks'])
+    with _lock:
+        _indexes[key] = lexical
+        while len(_indexes) > MAX_INDEXES_IN_MEMORY:
+            _indexes.popitem(last=False)
+    return lexical
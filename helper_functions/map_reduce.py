@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import asyncio
+from helper_functions import aio, chunking
+
+# """
+# Map-reduce over document chunks. Each chunk is mapped (e.g. answered by the
+# LLM) on the shared event loop with bounded concurrency, and the partial
+# results are kept in input order. If the partials do not fit the reducer's
+# context budget, consecutive groups that do fit are reduced first, level by
+# level, until one final reduce covers everything.
+# """
+
+DEFAULT_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", 4))
+# Token budget for the partial results passed to one reduce call.
+DEFAULT_REDUCE_TOKENS = int(os.getenv("MAP_REDUCE_CONTEXT_TOKENS", 3000))
+MAX_LEVELS = 4
+
+
+def group_by_budget(texts, budget, count_tokens=chunking.count_tokens):
+    """Splits `texts` into consecutive groups whose token total stays within `budget`."""
+    groups, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and current_tokens + tokens > budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def map_reduce_async(items, map_fn, reduce_fn, concurrency=DEFAULT_CONCURRENCY,
+                           reduce_tokens=DEFAULT_REDUCE_TOKENS, count_tokens=chunking.count_tokens,
+                           stats=None):
+    """Returns (partials, result).
+
+    `map_fn(item)` and `reduce_fn(texts, final)` are coroutine functions that
+    return text. `partials` holds the mapped results in input order; items
+    whose map step failed are logged and left out.
+    """
+    stats = {} if stats is None else stats
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(coroutine_fn, *args):
+        async with semaphore:
+            return await coroutine_fn(*args)
+
+    started = time.perf_counter()
+    mapped = await asyncio.gather(*[bounded(map_fn, item) for item in items], return_exceptions=True)
+    partials = []
+    for position, result in enumerate(mapped):
+        if isinstance(result, Exception):
+            print(f"[map_reduce] map step failed for item {position}: {result}", file=sys.stderr)
+        else:
+            partials.append(result)
+    stats.update({'items': len(items), 'mapped': len(partials), 'map_seconds': time.perf_counter() - started})
+
+    texts, levels = partials, 0
+    while levels < MAX_LEVELS and len(texts) > 1:
+        groups = group_by_budget(texts, reduce_tokens, count_tokens)
+        if len(groups) == 1:
+            break
+        # Intermediate reduces run concurrently too, and stay in order.
+        reduced = await asyncio.gather(*[bounded(reduce_fn, group, False) for group in groups],
+                                       return_exceptions=True)
+        texts = []
+        for group, result in zip(groups, reduced):
+            if isinstance(result, Exception):
+                # Pass the group on unreduced rather than losing it.
+                print(f"[map_reduce] reduce step failed: {result}", file=sys.stderr)
+                texts.append("\n".join(group))
+            else:
+                texts.append(result)
+        levels += 1
+
+    result = await reduce_fn(texts, True)
+    stats.update({'reduce_levels': levels + 1, 'seconds': time.perf_counter() - started})
+    print(f"[map_reduce] {stats['mapped']}/{stats['items']} mapped in {stats['map_seconds']:.2f}s, "
+          f"{stats['reduce_levels']} reduce level(s), {stats['seconds']:.2f}s total", file=sys.stderr)
+    return partials, result
+
+
+def map_reduce(items, map_fn, reduce_fn, **kwargs):
+    """Blocking wrapper around `map_reduce_async` for page scripts."""
+    return aio.run(map_reduce_async(list(items), map_fn, reduce_fn, **kwargs))
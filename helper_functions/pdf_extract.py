@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pdfplumber
+
+# """
+# Parallel, incremental PDF text extraction. Page ranges are spread over a
+# process pool and pages are yielded in order as soon as each range is done,
+# so callers can start chunking the first pages before the last are parsed.
+# """
+
+DEFAULT_PAGES_PER_TASK = 8
+
+
+def count_pages(path):
+    """Returns the number of pages in the PDF at `path`."""
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(path, start, stop):
+    """Returns [(page_number, text), ...] for pages start..stop-1 (0-based), numbered from 1."""
+    with pdfplumber.open(path) as pdf:
+        return [(index + 1, pdf.pages[index].extract_text() or "") for index in range(start, stop)]
+
+
+def _mp_context():
+    # Never fork: the Streamlit and refresher processes are multithreaded, and a forked child can inherit a
+    # lock held by another thread and deadlock.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _default_workers():
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+def iter_pages(source, workers=None, pages_per_task=DEFAULT_PAGES_PER_TASK, stats=None):
+    """Yields (page_number, text) for every page of a PDF, in page order.
+
+    `source` is a file path or the PDF bytes. Pass a dict as `stats` to have
+    it filled with page count, elapsed seconds and pages/sec once done.
+    """
+    tmp_path = None
+    if isinstance(source, (bytes, bytearray)):
+        # Workers open the file themselves rather than being sent the bytes for every range.
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(source)
+            tmp_path = source = tmp.name
+
+    started = time.perf_counter()
+    total = 0
+    try:
+        page_count = count_pages(source)
+        workers = workers or _default_workers()
+        ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+        if workers == 1 or len(ranges) <= 1:
+            for start, stop in ranges:
+                for page in extract_page_range(source, start, stop):
+                    total += 1
+                    yield page
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=_mp_context()) as pool:
+                futures = [pool.submit(extract_page_range, source, start, stop) for start, stop in ranges]
+                # Collect in submission order so pages stream out in page order.
+                for future in futures:
+                    for page in future.result():
+                        total += 1
+                        yield page
+    finally:
+        if tmp_path is not None:
+            os.unlink(tmp_path)
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed > 0 else 0.0
+        if stats is not None:
+            stats.update({'pages': total, 'seconds': elapsed, 'pages_per_sec': rate})
+        print(f"[pdf_extract] {total} pages in {elapsed:.2f}s ({rate:.1f} pages/sec)", file=sys.stderr)
+
+
+def extract_pages(source, workers=None, pages_per_task=DEFAULT_PAGES_PER_TASK, stats=None):
+    """Returns the text of every page as a list, using "" for pages without text."""
+    return [text for _, text in iter_pages(source, workers, pages_per_task, stats)]
@@ -0,0 +1,158 @@
+import sys
+import time
+import queue
+import asyncio
+import inspect
+import concurrent.futures
+from helper_functions import aio
+
+# """
+# A small async DAG executor for the per-query LLM stages. Each stage starts
+# on the shared event loop as soon as the stages it depends on have finished,
+# so independent stages (e.g. the subheader and the answer) run concurrently
+# and the request takes roughly as long as its slowest path.
+#
+# A stage returns either an awaitable or an async iterator; the latter is a
+# streaming stage whose chunks can be consumed from the page script with
+# `Pipeline.stream` while it is still running.
+# """
+
+_DONE = object()
+
+
+class Stage:
+    """A named step; `func` is called with the results of `after` as keyword arguments."""
+
+    def __init__(self, name, func, after=()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+
+
+class Pipeline:
+    """Runs a set of stages on the shared loop; start it, then collect results or streams."""
+
+    def __init__(self, stages, label="pipeline"):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [name for name in stage.after if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stage(s) {missing}")
+        # Cycles are rejected here too, before anything runs on the loop where nobody would see the error.
+        self._order = self._ordered()
+        self.label = label
+        self.timings = {}
+        self._futures = {name: concurrent.futures.Future() for name in self.stages}
+        self._streams = {name: queue.Queue() for name in self.stages}
+        self._done = None
+        self._started = None
+
+    def start(self):
+        """Schedules every stage and returns immediately."""
+        self._started = time.perf_counter()
+        self._done = asyncio.run_coroutine_threadsafe(self._run(), aio.get_loop())
+        return self
+
+    async def _run(self):
+        tasks = {}
+
+        async def run_stage(stage):
+            try:
+                inputs = {name: await tasks[name] for name in stage.after}
+                result = await self._call(stage, inputs)
+            except BaseException as e:
+                self._streams[stage.name].put(e)
+                self._futures[stage.name].set_exception(e)
+                raise
+            self._futures[stage.name].set_result(result)
+            return result
+
+        try:
+            # Tasks are created in dependency order so each one can await its inputs.
+            for stage in self._order:
+                tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except BaseException as e:
+            # Never leave a page blocked on `result` or `stream` of a stage that will not run.
+            for name, future in self._futures.items():
+                if not future.done():
+                    self._streams[name].put(e)
+                    future.set_exception(e)
+            raise
+        self._log()
+
+    async def _call(self, stage, inputs):
+        started = time.perf_counter()
+        timing = self.timings[stage.name] = {'start': started - self._started}
+        result = stage.func(**inputs)
+        if hasattr(result, '__aiter__'):
+            # Streaming stage: forward chunks as they arrive and return the joined text.
+            chunks = []
+            async for chunk in result:
+                if not chunks:
+                    timing['first_chunk'] = time.perf_counter() - started
+                chunks.append(chunk)
+                self._streams[stage.name].put(chunk)
+            result = "".join(chunks)
+        elif inspect.isawaitable(result):
+            result = await result
+        self._streams[stage.name].put(_DONE)
+        timing['seconds'] = time.perf_counter() - started
+        return result
+
+    def _ordered(self):
+        ordered, seen, visiting = [], set(), set()
+
+        def visit(name):
+            if name in seen:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage {name!r} is part of a dependency cycle")
+            visiting.add(name)
+            for dependency in self.stages[name].after:
+                visit(dependency)
+            visiting.discard(name)
+            seen.add(name)
+            ordered.append(self.stages[name])
+
+        for name in self.stages:
+            visit(name)
+        return ordered
+
+    def _log(self):
+        total = time.perf_counter() - self._started
+        parts = []
+        for name, timing in self.timings.items():
+            if 'seconds' not in timing:
+                parts.append(f"{name} failed")
+                continue
+            text = f"{name} {timing['seconds']:.2f}s"
+            if 'first_chunk' in timing:
+                text += f" (first chunk {timing['first_chunk']:.2f}s)"
+            parts.append(text)
+        self.timings['total'] = {'start': 0.0, 'seconds': total}
+        print(f"[{self.label}] {', '.join(parts)}; end to end {total:.2f}s", file=sys.stderr)
+
+    def result(self, name, timeout=None):
+        """Blocks until stage `name` finishes and returns its result (re-raising its error)."""
+        return self._futures[name].result(timeout)
+
+    def stream(self, name):
+        """Yields the chunks of streaming stage `name` as they arrive."""
+        while True:
+            chunk = self._streams[name].get()
+            if chunk is _DONE:
+                return
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+
+    def wait(self, timeout=None):
+        """Blocks until every stage has finished; returns {name: result}."""
+        self._done.result(timeout)
+        return {name: future.result() for name, future in self._futures.items()}
+
+
+def run(stages, label="pipeline", timeout=None):
+    """Runs `stages` to completion and returns {name: result}."""
+    return Pipeline(stages, label).start().wait(timeout)
@@ -0,0 +1,126 @@
+import os
+import re
+import sys
+from helper_functions import chunking, tracing
+
+# """
+# Prompt-token budgeting for LLM calls. `pack_messages` takes a prompt
+# template and ranked evidence, drops duplicate evidence, and keeps as much of
+# the best-ranked evidence as fits the call's token budget after reserving room
+# for the completion (`max_tokens`). Every call's token accounting is logged to
+# stderr.
+# """
+
+# Context windows (prompt + completion) of the chat models the portal uses.
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o-mini": 128_000,
+    "gpt-4o": 128_000,
+}
+DEFAULT_CONTEXT_TOKENS = 128_000
+# Per-call cap on prompt + completion tokens; well below the context window to bound cost and latency.
+DEFAULT_CALL_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 8000))
+
+# Chat formatting overhead: every message is wrapped in a few tokens, and the reply is primed with 3.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+# Rough per-item cost of the list punctuation around each piece of evidence.
+TOKENS_PER_ITEM = 4
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def count_message_tokens(messages, encoding_name=chunking.ENCODING_NAME):
+    """Returns the number of prompt tokens `messages` will use."""
+    encoding = chunking.get_encoding(encoding_name)
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE
+        for value in message.values():
+            total += len(encoding.encode(str(value), disallowed_special=()))
+    return total
+
+
+def call_budget(model, max_tokens, budget=None):
+    """Returns the prompt tokens available to one call after reserving `max_tokens` for the reply."""
+    budget = DEFAULT_CALL_BUDGET if budget is None else budget
+    return min(budget, MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)) - max_tokens
+
+
+def _normalise(text):
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def dedupe(evidence):
+    """Drops empty items, repeats, and items contained in another item, keeping rank order."""
+    keys = [_normalise(text) for text in evidence]
+    return [
+        text for i, (text, key) in enumerate(zip(evidence, keys))
+        if key and key not in keys[:i]
+        and not any(key in other and key != other for other in keys)
+    ]
+
+
+def pack(evidence, budget, encoding_name=chunking.ENCODING_NAME, truncate=True):
+    """Returns (packed, stats): the best-ranked unique items whose tokens fit `budget`.
+
+    Items that do not fit are skipped so a smaller, lower-ranked one can still
+    be used. With `truncate`, if not even the top item fits, its beginning is
+    kept instead of nothing.
+    """
+    encoding = chunking.get_encoding(encoding_name)
+    unique = dedupe(evidence)
+    packed, used, dropped = [], 0, 0
+    for text in unique:
+        tokens = encoding.encode(text, disallowed_special=())
+        cost = len(tokens) + TOKENS_PER_ITEM
+        if used + cost <= budget:
+            packed.append(text)
+            used += cost
+        elif truncate and not packed and budget > TOKENS_PER_ITEM:
+            packed.append(encoding.decode(tokens[:budget - TOKENS_PER_ITEM]))
+            used = budget
+        else:
+            dropped += 1
+    stats = {'items': len(evidence), 'duplicates': len(evidence) - len(unique), 'packed': len(packed),
+             'dropped': dropped, 'evidence_tokens': used}
+    return packed, stats
+
+
+def pack_messages(render, evidence=(), model="gpt-4o-mini", max_tokens=512, budget=None, label="llm"):
+    """Returns the chat messages `render(packed_evidence)` with the evidence fitted to the call budget.
+
+    `render` builds the messages for a given evidence list, so the fixed part
+    of the prompt is measured (with no evidence) rather than guessed.
+    """
+    available = call_budget(model, max_tokens, budget)
+    fixed_tokens = count_message_tokens(render([]))
+    evidence = list(evidence)
+    packed, stats = pack(evidence, available - fixed_tokens) if evidence else ([], {})
+    messages = render(packed)
+    prompt_tokens = count_message_tokens(messages)
+    # The per-item overhead is an estimate; trim from the bottom if it was too optimistic.
+    while packed and prompt_tokens > available:
+        packed = packed[:-1]
+        stats['packed'] -= 1
+        stats['dropped'] += 1
+        messages = render(packed)
+        prompt_tokens = count_message_tokens(messages)
+
+    tracing.add(prompt_tokens=prompt_tokens)
+    evidence_text = (f", evidence {stats['packed']}/{stats['items']} items "
+                     f"({stats['duplicates']} duplicate, {stats['dropped']} over budget)") if stats else ""
+    print(f"[{label}] prompt {prompt_tokens} tokens (fixed {fixed_tokens}) + max_tokens {max_tokens} "
+          f"of {available + max_tokens} budget{evidence_text}", file=sys.stderr)
+    return messages
+
+
+def measure(messages, model="gpt-4o-mini", max_tokens=512, label="llm"):
+    """Logs the token accounting of a prompt without evidence to pack; returns `messages` unchanged."""
+    prompt_tokens = count_message_tokens(messages)
+    tracing.add(prompt_tokens=prompt_tokens)
+    if prompt_tokens + max_tokens > MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS):
+        print(f"[{label}] prompt of {prompt_tokens} tokens + max_tokens {max_tokens} exceeds the {model} context",
+              file=sys.stderr)
+    else:
+        print(f"[{label}] prompt {prompt_tokens} tokens + max_tokens {max_tokens}", file=sys.stderr)
+    return messages
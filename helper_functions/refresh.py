@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+from openai import OpenAI
+from helper_functions import sources, retrieval, report_cache, report_answers, indexer
+
+# """
+# Out-of-band refresh of the scraped corpora and report indexes, e.g. from cron:
+#
+#   python -m helper_functions.refresh                      # everything
+#   python -m helper_functions.refresh --corpus career_guidance
+#   python -m helper_functions.refresh --report sdfe_2023 --offline
+#
+# Pages are revalidated against the live sites (ETag / Last-Modified) and
+# only added or changed chunks are re-embedded, see indexer.update_index.
+# """
+
+
+def make_client():
+    """Returns an OpenAI client configured from .env or the environment."""
+    load_dotenv('.env')
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+
+def _embedder(client, model):
+    return lambda texts: retrieval.embed_corpus(client, texts, model)
+
+
+def refresh_corpus(client, name, ttl=0, model=retrieval.EMBEDDING_MODEL):
+    """Re-scrapes web corpus `name` and updates its index; returns the indexer stats."""
+    scraped_data = sources.scrape_corpus(name, ttl=ttl, stale_ttl=0)
+    for page in scraped_data:
+        if 'error' in page:
+            print(page['error'], file=sys.stderr)
+    if scraped_data and all('error' in page for page in scraped_data):
+        # Don't publish an empty index: the failure is recorded and the next page load or refresh retries.
+        from helper_functions import fetch
+        raise fetch.FetchError(f"{name}: none of its {len(scraped_data)} pages could be fetched")
+    chunks = retrieval.corpus_chunks(scraped_data)
+    _, stats = indexer.update_index(name, chunks, _embedder(client, model), model)
+    return stats
+
+
+def index_report(client, name, ttl=0, model=retrieval.EMBEDDING_MODEL, progress=None):
+    """Re-downloads (if changed) and re-indexes report `name` only; returns the indexer stats."""
+    report = report_cache.load_chunked_report(sources.REPORTS[name], ttl=ttl, progress=progress)
+    _, stats = indexer.update_index(name, report['chunks'], _embedder(client, model), model)
+    return stats
+
+
+def refresh_report(client, name, ttl=0, model=retrieval.EMBEDDING_MODEL):
+    """Re-downloads (if changed) and re-indexes report `name`; returns the indexer stats.
+
+    If the PDF changed, its summary tree and precomputed headline answers are rebuilt too (see report_answers.py).
+    """
+    stats = index_report(client, name, ttl, model)
+    try:
+        stats['precomputed'] = report_answers.build(client, name)
+    except Exception as e:
+        # The page answers those questions live until the next refresh succeeds.
+        print(f"[refresh] {name}: precomputing answers failed: {e}", file=sys.stderr)
+        stats['precomputed'] = {'error': str(e)}
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the portal's scraped corpora and vector indexes.")
+    parser.add_argument("--corpus", action="append", choices=sorted(sources.CORPORA),
+                        help="web corpus to refresh (repeatable; default: all)")
+    parser.add_argument("--report", action="append", choices=sorted(sources.REPORTS),
+                        help="report to refresh (repeatable; default: all)")
+    parser.add_argument("--offline", action="store_true",
+                        help="use only the scrape cache, never the network (chunks are still re-indexed)")
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        os.environ["SCRAPE_CACHE_OFFLINE"] = "1"
+    corpora = args.corpus or ([] if args.report else sorted(sources.CORPORA))
+    reports = args.report or ([] if args.corpus else sorted(sources.REPORTS))
+    client = make_client()
+
+    for name in corpora:
+        started = time.perf_counter()
+        stats = refresh_corpus(client, name)
+        print(f"{name}: {stats} in {time.perf_counter() - started:.1f}s")
+    for name in reports:
+        started = time.perf_counter()
+        stats = refresh_report(client, name)
+        print(f"{name}: {stats} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
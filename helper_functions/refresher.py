@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import tempfile
+import time
+import argparse
+import threading
+import traceback
+from collections import defaultdict
+
+# """
+# Background refresh of the scraped corpora and report indexes. A daemon
+# thread, started once per Streamlit process, re-scrapes and re-indexes every
+# source each REFRESH_INTERVAL_SECONDS. Each index is saved as a new version
+# and switched to atomically (vector_index.save_index), so page scripts only
+# ever read the latest ready snapshot and never scrape inline.
+#
+# The indexing modules (OpenAI, pdfplumber, numpy) are imported by the
+# functions that refresh or load indexes, so pages that only show the refresh
+# status do not pay for them.
+#
+# The same loop can run as a separate worker process instead:
+#
+#   python -m helper_functions.refresher            # loop forever
+#   python -m helper_functions.refresher --once
+# """
+
+REFRESH_INTERVAL_SECONDS = int(os.getenv("REFRESH_INTERVAL_SECONDS", 6 * 3600))
+# scrape_cache.CACHE_DIR, read directly: the status banner on the landing page must not import the HTTP stack.
+STATUS_PATH = os.path.join(os.getenv("PORTAL_CACHE_DIR", ".cache"), "refresh_status.json")
+
+# One lock per source, so a cold-start build of one corpus waits only for that corpus.
+_source_locks = defaultdict(threading.Lock)
+_refresh_lock = threading.Lock()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def read_status():
+    """Returns the last refresh status {'started_at', 'finished_at', 'seconds', 'targets'}, or {}."""
+    try:
+        with open(STATUS_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_status(status):
+    os.makedirs(os.path.dirname(STATUS_PATH) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(STATUS_PATH) or ".", prefix="refresh_status.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, STATUS_PATH)
+
+
+def _targets():
+    from helper_functions import refresh, sources
+    return [('corpus', name, refresh.refresh_corpus) for name in sorted(sources.CORPORA)] + \
+           [('report', name, refresh.refresh_report) for name in sorted(sources.REPORTS)]
+
+
+def refresh_all(client):
+    """Refreshes every corpus and report once; returns the status that was recorded.
+
+    A failing source is logged and keeps serving its previous snapshot. Each
+    source's fetch, parse and embedding work is traced (see tracing.py).
+    """
+    from helper_functions import tracing
+    with _refresh_lock:
+        started = time.time()
+        targets = {}
+        for kind, name, refresh_target in _targets():
+            target_started = time.perf_counter()
+            try:
+                with _source_locks[name], tracing.trace("refresher", target=name):
+                    stats = refresh_target(client, name)
+                targets[name] = {'kind': kind, 'ok': True, 'stats': stats}
+            except Exception as e:
+                print(f"[refresher] {name} failed: {e}", file=sys.stderr)
+                traceback.print_exc()
+                targets[name] = {'kind': kind, 'ok': False, 'error': str(e)}
+            targets[name].update({'refreshed_at': time.time(), 'seconds': time.perf_counter() - target_started})
+
+        finished = time.time()
+        status = {'started_at': started, 'finished_at': finished, 'seconds': finished - started, 'targets': targets}
+        _write_status(status)
+        print(f"[refresher] refreshed {len(targets)} source(s) in {finished - started:.1f}s", file=sys.stderr)
+        return status
+
+
+def snapshot(name):
+    """Returns the latest ready index for corpus or report `name` (memory-mapped), or None."""
+    from helper_functions import vector_index
+    return vector_index.load_index(name)
+
+
+def _build_once(name, build):
+    # Builds source `name` under its lock unless another session or the refresher has published it meanwhile.
+    lock = _source_locks[name]
+    while not lock.acquire(timeout=1):
+        # The refresher may hold the lock for longer than the index takes (e.g. a report's summary tree),
+        # so serve its snapshot as soon as it is published.
+        index = snapshot(name)
+        if index is not None:
+            return index
+    try:
+        if snapshot(name) is None:
+            build()
+    finally:
+        lock.release()
+    return snapshot(name)
+
+
+def corpus_index(client, name):
+    """Returns the latest index snapshot of corpus `name`.
+
+    Only a process that has never indexed the corpus builds it inline (once).
+    """
+    index = snapshot(name)
+    if index is not None:
+        return index
+    from helper_functions import refresh
+    return _build_once(name, lambda: refresh.refresh_corpus(client, name, ttl=None))
+
+
+def report_index(client, name, progress=None):
+    """Returns the latest index snapshot of report `name`.
+
+    Only a process that has never indexed the report extracts and indexes it
+    inline (once), calling `progress(pages_done)` as pages are extracted. The
+    summary tree and precomputed answers are left to the refresher.
+    """
+    index = snapshot(name)
+    if index is not None:
+        return index
+    from helper_functions import refresh
+    return _build_once(name, lambda: refresh.index_report(client, name, ttl=None, progress=progress))
+
+
+def run_forever(client, interval=REFRESH_INTERVAL_SECONDS):
+    """Refreshes whenever the last refresh (by any process) is older than `interval`."""
+    last_attempt = 0.0
+    while True:
+        last = max(read_status().get('finished_at') or 0.0, last_attempt)
+        if time.time() - last >= interval:
+            last_attempt = time.time()
+            try:
+                refresh_all(client)
+            except Exception:
+                # Keep the thread alive; the next attempt is one interval later.
+                traceback.print_exc()
+            continue
+        # Wake up at least once a minute so a refresh by another process is noticed.
+        time.sleep(min(60, last + interval - time.time()))
+
+
+def start(client, interval=REFRESH_INTERVAL_SECONDS):
+    """Starts the background refresh thread for this process (once); returns it."""
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=run_forever, args=(client, interval),
+                                       name="portal-refresher", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Periodically refresh the portal's corpora and indexes.")
+    parser.add_argument("--once", action="store_true", help="refresh once and exit")
+    parser.add_argument("--interval", type=int, default=REFRESH_INTERVAL_SECONDS, help="seconds between refreshes")
+    args = parser.parse_args(argv)
+
+    from helper_functions import refresh
+    client = refresh.make_client()
+    if args.once:
+        refresh_all(client)
+    else:
+        run_forever(client, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import tempfile
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from helper_functions import report_cache, router, sources
+
+# """
+# Precomputed answers for the headline questions of each report in the
+# library (reports.json). Whenever a report's PDF changes (a new SHA-256), the build step builds the report's
+# summary tree (summary_tree.py), answers each of its HEADLINE_QUESTIONS from
+# the tree with the same map-reduce prompts as the live page (report_qa.py),
+# and stores the answers and the tree's section summaries in
+# .cache/reports/answers/<name>.json. The page serves those questions from
+# this file without any API call.
+#
+# The refresher runs the build after re-indexing a report. It can also be run
+# by hand, against the cached PDF with --offline:
+#
+#   python -m helper_functions.report_answers                 # every report whose PDF changed
+#   python -m helper_functions.report_answers --report sdfe_2023 --force --offline
+# """
+
+ANSWERS_DIR = os.path.join(report_cache.REPORTS_DIR, "answers")
+# Bump when the answer prompts or the stored layout change, so stored answers are rebuilt.
+ANSWERS_VERSION = 3
+MAX_ANSWERS_IN_MEMORY = 8
+
+HEADLINE_QUESTIONS = {name: entry['headline_questions'] for name, entry in sources.REPORT_LIBRARY.items()}
+
+_lock = threading.Lock()
+# name -> (file mtime, stored answers); least recently used dropped first.
+_loaded = OrderedDict()
+
+
+def _path(name):
+    return os.path.join(ANSWERS_DIR, f"{name}.json")
+
+
+def _read(name):
+    path = _path(name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _lock:
+        if name in _loaded and _loaded[name][0] == mtime:
+            _loaded.move_to_end(name)
+            return _loaded[name][1]
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _loaded[name] = (mtime, stored)
+        _loaded.move_to_end(name)
+        while len(_loaded) > MAX_ANSWERS_IN_MEMORY:
+            _loaded.popitem(last=False)
+    return stored
+
+
+def _write(name, stored):
+    os.makedirs(ANSWERS_DIR, exist_ok=True)
+    path = _path(name)
+    # Write to a temporary file first so the page never reads a half-written file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(stored, f)
+    os.replace(tmp_path, path)
+
+
+def load(name, index_hash):
+    """Returns the stored answers of report `name` if they were built from the index version `index_hash`."""
+    stored = _read(name)
+    if stored is None or stored.get('version') != ANSWERS_VERSION or stored.get('index_hash') != index_hash:
+        return None
+    return stored
+
+
+def answer(name, index_hash, query):
+    """Returns the precomputed {'summary', 'full_response'} for a headline question `query`, or None."""
+    question = router.match_example(query, HEADLINE_QUESTIONS.get(name, []))
+    stored = load(name, index_hash) if question else None
+    return stored['answers'].get(question) if stored else None
+
+
+def sections(name, index_hash):
+    """Returns the stored section summaries [{'title', 'first_page', 'last_page', 'summary'}, ...] of report `name`."""
+    stored = load(name, index_hash)
+    return stored['sections'] if stored else []
+
+
+def build(client, name, force=False):
+    """Precomputes the summary tree, headline answers and section summaries of report `name` unless up to date.
+
+    Returns {'built': bool, 'answers': count, 'sections': count, 'tree': tree
+    build stats}. Headline questions whose summary failed are left out, and
+    retried by the next build.
+    """
+    from helper_functions import embeddings, retrieval, report_library, report_qa, summary_tree
+
+    report = report_cache.load_chunked_report(sources.REPORTS[name])
+    index = retrieval.get_index(client, report['chunks'], name=name)
+    tree_stats = summary_tree.build(client, name, report, index, sources.REPORT_LIBRARY[name]['title'], force=force)
+    questions = HEADLINE_QUESTIONS.get(name, [])
+    stored = _read(name)
+    if (not force and stored is not None and stored.get('version') == ANSWERS_VERSION
+            and stored.get('digest') == report['digest'] and stored.get('tree_hash') == tree_stats['hash']
+            and set(stored.get('answers', {})) == set(questions)):
+        return {'built': False, 'answers': len(stored['answers']), 'sections': len(stored['sections']),
+                'tree': tree_stats}
+
+    started = time.perf_counter()
+    async_client = embeddings.async_client_for(client, max_retries=2)
+    document = report_library.open_document(name, index)
+    answers = {}
+    for question in questions:
+        query_vector = report_library.query_embedding(client, [document], question)
+        full_response, summary = report_qa.generate_response(client, async_client, question, [document],
+                                                             query_vector)
+        if summary in (report_qa.SUMMARY_FAILED, report_qa.NO_RELEVANT_INFORMATION):
+            print(f"[report_answers] {name}: no answer for {question!r}", file=sys.stderr)
+            continue
+        answers[question] = {'summary': summary, 'full_response': full_response}
+
+    sections = summary_tree.sections(document.tree) if document.tree is not None else []
+    stored = {
+        'version': ANSWERS_VERSION,
+        'digest': report['digest'],
+        'index_hash': index['hash'],
+        'tree_hash': tree_stats['hash'],
+        'built_at': time.time(),
+        'answers': answers,
+        'sections': [{'title': section['title'], 'first_page': section['first_page'],
+                      'last_page': section['last_page'], 'summary': section['summary']} for section in sections],
+    }
+    _write(name, stored)
+    print(f"[report_answers] {name}: {len(answers)}/{len(questions)} answers, {len(sections)} sections "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return {'built': True, 'answers': len(answers), 'sections': len(sections), 'tree': tree_stats}
+
+
+def main(argv=None):
+    from helper_functions import refresh
+    parser = argparse.ArgumentParser(description="Build the reports' summary trees and precomputed headline answers.")
+    parser.add_argument("--report", action="append", choices=sorted(sources.REPORTS),
+                        help="report to build (repeatable; default: all)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the PDF has not changed")
+    parser.add_argument("--offline", action="store_true",
+                        help="use only the cached PDF, never the network (the LLM is still called)")
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        os.environ["SCRAPE_CACHE_OFFLINE"] = "1"
+    client = refresh.make_client()
+    for name in args.report or sorted(sources.REPORTS):
+        started = time.perf_counter()
+        stats = build(client, name, force=args.force)
+        print(f"{name}: {stats} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import os
+import json
+import tempfile
+import time
+import threading
+from collections import OrderedDict
+from helper_functions import scrape_cache, chunking, tracing
+
+# """
+# Content-addressed cache for report artifacts. The PDF itself lives in the
+# scrape cache; its SHA-256 keys a directory holding the extracted per-page
+# text and the chunk lists built from it, e.g.
+#
+#   .cache/reports/<sha256>/pages.json
+#   .cache/reports/<sha256>/chunks-<chunk_key>.json
+#
+# Loaded artifacts are also kept in memory, so every session in the process
+# shares one copy and a rerun costs a dictionary lookup.
+# """
+
+REPORTS_DIR = os.path.join(scrape_cache.CACHE_DIR, "reports")
+# How often (seconds) a URL is re-checked against the scrape cache for a new PDF.
+RECHECK_SECONDS = 300
+MAX_REPORTS_IN_MEMORY = 4
+# Report chunks are measured in real gpt-4o-mini tokens (roughly the old 2000-character chunks).
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+
+_lock = threading.Lock()
+_url_digests = {}
+_artifacts = OrderedDict()
+
+
+class ExtractionError(Exception):
+    """Raised when the text of a PDF could not be extracted."""
+
+
+def _write_json(path, data):
+    # Write to a temporary file first so readers never see a half-written artifact.
+    # Unique per writer, so a page and the refresher writing the same artifact never share one.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def iter_extracted_pages(pdf_bytes, progress=None):
+    """Yields the text of every page of a PDF in page order, as page ranges are extracted in parallel.
+
+    `progress`, if given, is called with the number of pages done so far as
+    pages stream in. Raises `ExtractionError` if the PDF cannot be parsed.
+    """
+    # pdfplumber is only needed when a PDF has not been extracted before.
+    from helper_functions import pdf_extract
+    done = 0
+    with tracing.span("parse", kind="pdf") as parse_span:
+        pages = pdf_extract.iter_pages(pdf_bytes)
+        while True:
+            # Only parsing failures become ExtractionError; the caller's progress and chunking errors pass through.
+            try:
+                _, text = next(pages)
+            except StopIteration:
+                break
+            except Exception as e:
+                raise ExtractionError(str(e)) from e
+            done += 1
+            if progress is not None:
+                progress(done)
+            yield text
+        parse_span.add(pages=done)
+
+
+def extract_pages(pdf_bytes, progress=None):
+    """Returns the text of every page of a PDF as a list (see `iter_extracted_pages`)."""
+    return list(iter_extracted_pages(pdf_bytes, progress))
+
+
+def _report_dir(digest):
+    path = os.path.join(REPORTS_DIR, digest)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_artifacts(digest, pdf_bytes, chunk, chunk_key, progress=None):
+    """Returns the extracted pages and chunks for a PDF, building them only on first use.
+
+    `chunk` turns an iterable of page texts into chunks; `chunk_key` names
+    that chunking configuration so differently chunked copies can coexist on
+    disk. `progress` is passed on to `iter_extracted_pages`.
+    """
+    memo_key = (digest, chunk_key)
+    with _lock:
+        if memo_key in _artifacts:
+            _artifacts.move_to_end(memo_key)
+            return _artifacts[memo_key]
+
+    report_dir = _report_dir(digest)
+    pages_path = os.path.join(report_dir, "pages.json")
+    chunks_path = os.path.join(report_dir, f"chunks-{chunk_key}.json")
+    pages = _read_json(pages_path)
+    if pages is None:
+        # Pages are chunked as they stream out of the extraction pool, so chunking the first pages
+        # overlaps with parsing the last ones instead of waiting for the whole document.
+        pages = []
+
+        def extracted():
+            for page in iter_extracted_pages(pdf_bytes() if callable(pdf_bytes) else pdf_bytes, progress):
+                pages.append(page)
+                yield page
+
+        chunks = list(chunk(extracted()))
+        _write_json(pages_path, pages)
+        _write_json(chunks_path, chunks)
+    else:
+        chunks = _read_json(chunks_path)
+        if chunks is None:
+            chunks = list(chunk(pages))
+            _write_json(chunks_path, chunks)
+
+    text = "\n".join(pages)
+
+    artifacts = {'digest': digest, 'pages': pages, 'text': text, 'chunks': chunks}
+    with _lock:
+        _artifacts[memo_key] = artifacts
+        while len(_artifacts) > MAX_REPORTS_IN_MEMORY:
+            _artifacts.popitem(last=False)
+    return artifacts
+
+
+def load_report(pdf_url, chunk, chunk_key, progress=None, ttl=None):
+    """Returns the cached artifacts for the PDF at `pdf_url`.
+
+    `ttl` overrides the scrape cache TTL for the PDF itself (0 forces a
+    revalidation). Raises `requests.exceptions.RequestException` if the PDF
+    has never been downloaded and cannot be fetched now.
+    """
+    now = time.time()
+    with _lock:
+        checked = _url_digests.get(pdf_url)
+    if checked is not None and now - checked[0] <= RECHECK_SECONDS and ttl is None:
+        # The body is only needed if the artifacts were evicted from disk.
+        return load_artifacts(checked[1], lambda: scrape_cache.get_page(pdf_url)['body'], chunk, chunk_key,
+                              progress)
+
+    entry = scrape_cache.get_page(pdf_url, ttl=ttl, stale_ttl=0 if ttl is not None else None)
+    with _lock:
+        _url_digests[pdf_url] = (now, entry['digest'])
+    return load_artifacts(entry['digest'], entry['body'], chunk, chunk_key, progress)
+
+
+def load_chunked_report(pdf_url, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, progress=None,
+                        ttl=None):
+    """Returns `load_report` artifacts with the report split by `chunking.chunk_pages`."""
+    # The encoding is part of the key, so chunks sized with approximate counts while the tokenizer could not
+    # be downloaded are rebuilt once it can.
+    encoding_name = chunking.get_encoding().name
+    return load_report(
+        pdf_url,
+        lambda pages: chunking.chunk_pages(pages, max_tokens=max_tokens, overlap_tokens=overlap_tokens),
+        f"tokens-{encoding_name}-{max_tokens}-{overlap_tokens}",
+        progress,
+        ttl,
+    )
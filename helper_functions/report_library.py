@@ -0,0 +1,92 @@
+import os
+import json
+
+# """
+# The report library: the report PDFs listed in reports.json, with their
+# title, URL, description, whether they are searched by default, and their
+# headline questions (see report_answers.py). Add a report by adding an entry
+# to the file; the refresher downloads and indexes it on its next run.
+#
+# Each report has its own artifacts under its name: extracted text and chunks
+# (report_cache.py), vector index (vector_index.py), summary tree
+# (summary_tree.py) and precomputed answers (report_answers.py). A query
+# searches only the reports the user selected, and only their indexes are
+# opened; the index, keyword-index, tree and answer caches are all
+# least-recently-used, so reports nobody asks about drop out of memory as
+# more are added.
+#
+# The retrieval modules are imported by the functions that search, so the
+# report page can read the titles before the login screen at no cost.
+# """
+
+REPORTS_CONFIG = os.getenv("PORTAL_REPORTS_CONFIG",
+                           os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports.json"))
+
+
+def load_library(path=REPORTS_CONFIG):
+    """Returns the report registry {name: {'title', 'url', 'description', 'default', 'headline_questions'}}."""
+    with open(path, encoding="utf-8") as f:
+        library = json.load(f)
+    for name, entry in library.items():
+        if not entry.get('url'):
+            raise ValueError(f"{path}: report {name!r} has no 'url'")
+        entry.setdefault('title', name)
+        entry.setdefault('description', "")
+        entry.setdefault('default', False)
+        entry.setdefault('headline_questions', [])
+    return library
+
+
+LIBRARY = load_library()
+
+
+class Document:
+    """One report of the library, opened for searching: its registry entry, index and summary tree (or None)."""
+
+    def __init__(self, name, index, tree=None):
+        from helper_functions import sources
+        entry = LIBRARY.get(name, {})
+        self.name = name
+        self.title = entry.get('title', name)
+        self.url = sources.REPORTS[name]
+        self.index = index
+        self.tree = tree
+
+    def __repr__(self):
+        return f"Document({self.name!r})"
+
+
+def titles():
+    """Returns {name: title} of every report in the library, in registry order."""
+    return {name: entry['title'] for name, entry in LIBRARY.items()}
+
+
+def default_selection():
+    """Returns the names of the reports searched when the user has not picked any."""
+    return [name for name, entry in LIBRARY.items() if entry['default']] or list(LIBRARY)[:1]
+
+
+def open_document(name, index):
+    """Returns the Document of report `name` for its index version `index`, with its summary tree if built."""
+    from helper_functions import summary_tree
+    return Document(name, index, summary_tree.load(name, index))
+
+
+def query_embedding(client, documents, query):
+    """Returns the query embedding shared by the searches of `documents`.
+
+    None if `query` is a keyword query for any of them (keyword search finds
+    it there), or if the embedding API fails. All report indexes are built
+    with the same embedding model.
+    """
+    from helper_functions import retrieval
+    if not documents or any(retrieval.is_keyword_query(document.index, query) for document in documents):
+        return None
+    return retrieval.try_embed_query(client, query, documents[0].index['model'])
+
+
+def version(documents):
+    """Returns a version string of a selection of documents, which changes when any of their indexes does."""
+    if len(documents) == 1:
+        return documents[0].index['hash']
+    return "+".join(document.index['hash'][:16] for document in documents)
@@ -0,0 +1,166 @@
+import os
+from helper_functions import retrieval, map_reduce, prompt_budget, summary_tree, tracing
+
+# """
+# Question answering over one or more reports of the library
+# (report_library.py). The most relevant chunks of each report are merged into
+# one ranking, each answered by the LLM (map) and the answers summarised
+# (reduce), see map_reduce.py. For a report with a summary tree
+# (summary_tree.py) the chunks are tree nodes instead: high-level summaries
+# for broad questions, specific passages for narrow ones. Used by the report
+# page and by the offline build of precomputed answers (report_answers.py).
+# """
+
+# Number of relevant report chunks answered per query, and how many are in flight at once.
+REPORT_TOP_K = int(os.getenv("REPORT_TOP_K", 8))
+REPORT_MAP_CONCURRENCY = int(os.getenv("REPORT_MAP_CONCURRENCY", map_reduce.DEFAULT_CONCURRENCY))
+SUMMARY_FAILED = "Summary generation failed."
+NO_RELEVANT_INFORMATION = "No relevant information found for your query."
+
+
+def retrieve_chunks(client, documents, user_message, query_vector=None):
+    """Returns the most relevant chunks of `documents` (report_library.Document), best first.
+
+    Each chunk gets the 'document' name and 'source' title of its report. The
+    reports' rankings are merged by fused score, which depends only on rank, so
+    their best chunks interleave; the merged list has as many chunks as one
+    report would give.
+    """
+    rankings, k = [], 0
+    for document in documents:
+        if document.tree is not None:
+            # A few summary or chunk nodes from any level of the tree, however long the report is
+            chunks = summary_tree.select(client, document.tree, user_message, query_vector)
+            k = max(k, summary_tree.TREE_TOP_K)
+        else:
+            # The most relevant chunks from anywhere in the report, not just its first pages
+            chunks = retrieval.retrieve(client, document.index, user_message, k=REPORT_TOP_K, min_score=0.0,
+                                        query_vector=query_vector, embed=False)
+            k = max(k, REPORT_TOP_K)
+        rankings.extend(dict(chunk, document=document.name, source=document.title) for chunk in chunks)
+    if len(documents) == 1:
+        return rankings
+    return sorted(rankings, key=lambda chunk: -chunk['score'])[:k]
+
+
+def generate_response(client, async_client, user_message, documents, query_vector=None):
+    """Returns (full response, summary) answering `user_message` from the most relevant chunks of `documents`."""
+    top_chunks = retrieve_chunks(client, documents, user_message, query_vector)
+    if not top_chunks:
+        # Nothing to answer from: same reply as the other chatbots, without calling the model.
+        return "", NO_RELEVANT_INFORMATION
+    used = [document for document in documents if any(chunk['document'] == document.name for chunk in top_chunks)]
+
+    # Each chunk is answered separately (map), then the answers are summarised (reduce).
+    # Answers keep the retrieval order; if they don't fit one summary prompt they are
+    # first combined in groups.
+    responses, summary = map_reduce.map_reduce(
+        top_chunks,
+        lambda chunk: process_chunk(async_client, chunk['text'], user_message, chunk['source']),
+        lambda partial_responses, final: summarise_responses(async_client, partial_responses, user_message,
+                                                             used or documents, final),
+        concurrency=REPORT_MAP_CONCURRENCY,
+    )
+
+    # Combine responses from each chunk
+    full_response = "\n".join(responses)
+    return full_response, summary
+
+
+def _titles(documents):
+    titles = [document.title for document in documents]
+    return titles[0] if len(titles) == 1 else ", ".join(titles[:-1]) + " and " + titles[-1]
+
+
+async def summarise_responses(async_client, responses, user_message, documents, final=True):
+    """Reduces partial answers: combines a group of them, or writes the final summary if `final`.
+
+    `documents` are the reports the answers come from, named in the prompts.
+    """
+    titles = _titles(documents)
+    links = " and ".join(document.url for document in documents)
+    if not final:
+        # Intermediate step of the reduction: merge a group of partial answers.
+        def render_combine(parts):
+            detailed_response = "\n".join(parts)
+            combine_prompt = f"""
+            The partial answers below each answer the query "{user_message}" from a different part of the
+            {titles}. Combine them into one consolidated answer,
+            keeping every distinct insight, skill, sector and figure, and dropping repetition.
+
+            Partial Answers:
+            {detailed_response}
+            """
+            return [{'role': 'system', 'content': combine_prompt}]
+
+        with tracing.span("llm.combine"):
+            response = await async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=prompt_budget.pack_messages(render_combine, responses, max_tokens=512, label="report_combine"),
+                max_tokens=512,
+                temperature=0.7
+            )
+            tracing.record_usage(response.usage)
+        return response.choices[0].message.content.strip()
+
+    def render_summary(parts):
+        detailed_response = "\n".join(parts)
+        summary_prompt = f"""
+        Based on the detailed response below, provide a concise summary to guide the reader in making informed choices 
+        about upskilling to either stay relevant at their current workplace or to pivot to job opportunities with growth potential. 
+        
+        Must remind users in that response is based on information from the {titles}. 
+        Important to inform users for detailed information, refer to {links}.
+        
+        Detailed Response:
+        {detailed_response}
+        
+        Please focus the summary on key insights for individuals to make informed decisions on jobs and skills matters.
+        """
+        return [{'role': 'system', 'content': summary_prompt}]
+
+    try:
+        with tracing.span("llm.summary"):
+            summary_response = await async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=prompt_budget.pack_messages(render_summary, responses, max_tokens=512, label="report_summary"),
+                max_tokens=512,
+                temperature=0.7
+            )
+            tracing.record_usage(summary_response.usage)
+        summary = summary_response.choices[0].message.content.strip()
+    except Exception as e:
+        summary = SUMMARY_FAILED
+
+    return summary
+
+
+async def process_chunk(async_client, chunk, user_message, source):
+    """Answers `user_message` from one chunk of the report titled `source`."""
+    # The chunk is sent once, in the system message, and cut to fit the token budget if needed.
+    def render(context):
+        system_message = f"""
+        You are given the following context extracted from the {source}:
+        {" ".join(context)}
+        
+        Based on this information, answer the following user query:
+        {user_message}
+        
+        Please provide a comprehensive and user-friendly response.
+        """
+        return [
+            {'role': 'system', 'content': system_message},
+            {'role': 'user', 'content': user_message},
+        ]
+
+    with tracing.span("llm.map"):
+        messages = prompt_budget.pack_messages(render, [chunk], model="gpt-4o-mini", max_tokens=512,
+                                               label="report_map")
+        response = await async_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=512,
+            temperature=0.7
+        )
+        tracing.record_usage(response.usage)
+    return response.choices[0].message.content.strip()
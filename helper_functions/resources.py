@@ -0,0 +1,93 @@
+import os
+import streamlit as st
+from dotenv import load_dotenv
+from openai import OpenAI
+from helper_functions import embeddings, fetch, lexical_index, refresher, vector_index
+
+# """
+# Process-wide resources shared by every page and session, built lazily on
+# first use with `st.cache_resource`: the OpenAI clients (one connection pool),
+# the background refresher, and read-only index snapshots. The pooled HTTP
+# session is owned by fetch.py, which the refresher also uses outside
+# Streamlit; `invalidate` closes it too. Call `invalidate` to drop and rebuild
+# them, e.g. after rotating the API key.
+# """
+
+MAX_INDEX_HANDLES = 8
+
+
+def openai_api_key():
+    """Returns the OpenAI API key from .env / the environment, else from Streamlit secrets."""
+    # load_dotenv never overrides variables that are already set, so repeated calls are harmless.
+    load_dotenv('.env')
+    return os.getenv('OPENAI_API_KEY') or st.secrets['OPENAI_API_KEY']
+
+
+@st.cache_resource(show_spinner=False)
+def get_client():
+    """Returns the shared OpenAI client."""
+    return OpenAI(api_key=openai_api_key())
+
+
+@st.cache_resource(show_spinner=False)
+def get_async_client():
+    """Returns the shared AsyncOpenAI client, used on the shared event loop for concurrent LLM calls."""
+    return embeddings.async_client_for(get_client(), max_retries=2)
+
+
+@st.cache_resource(show_spinner=False)
+def start_refresher():
+    """Starts the background corpus refresher once per process; returns its thread."""
+    return refresher.start(get_client())
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_INDEX_HANDLES)
+def _index_handle(name, version):
+    # Keyed by version: a refresh makes a new handle, and old ones age out of the cache.
+    index = refresher.snapshot(name)
+    if index is None or index['hash'] != version:
+        return None
+    # The matrix is memory-mapped read-only; keep the chunk list read-only by convention.
+    # Build its keyword index now, once per version, rather than on the first query.
+    lexical_index.get(index)
+    return index
+
+
+def get_index(name):
+    """Returns the latest ready index snapshot of corpus or report `name`, or None if it was never built."""
+    version = vector_index.current_version(name)
+    if version is None:
+        return None
+    index = _index_handle(name, version)
+    if index is None:
+        # The version changed between reading the pointer and opening it; don't cache the miss.
+        _index_handle.clear()
+        index = refresher.snapshot(name)
+    return index
+
+
+def get_corpus_index(name):
+    """Returns the latest index of web corpus `name`, building it inline only on a cold machine."""
+    return get_index(name) or refresher.corpus_index(get_client(), name)
+
+
+def get_report_index(name, progress=None):
+    """Returns the latest index of report `name`, extracting and indexing it inline only on a cold machine."""
+    return get_index(name) or refresher.report_index(get_client(), name, progress)
+
+
+def invalidate(*names):
+    """Drops cached resources so the next use rebuilds them.
+
+    `names` are any of 'client', 'http', 'indexes'; with none, everything is dropped.
+    """
+    names = set(names or ('client', 'http', 'indexes'))
+    if 'client' in names:
+        get_async_client.clear()
+        get_client.clear()
+        embeddings.clear_async_clients()
+    if 'http' in names:
+        # The next fetch opens a new pooled session.
+        fetch.close()
+    if 'indexes' in names:
+        _index_handle.clear()
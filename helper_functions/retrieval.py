@@ -0,0 +1,215 @@
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import openai
+from helper_functions import chunking, vector_index, indexer, embeddings, html_extract, lexical_index, tracing
+
+# """
+# Hybrid retrieval over the scraped corpus. The corpus is chunked and
+# embedded once into a normalised float32 matrix; a query costs one embedding
+# call and a matrix-vector product. A BM25 index over the same chunks
+# (lexical_index.py) ranks them by keywords, and the two rankings are merged
+# with reciprocal-rank fusion. Short keyword queries skip the embedding call.
+# """
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+CORPUS_CHUNK_TOKENS = 256
+CORPUS_OVERLAP_TOKENS = 32
+DEFAULT_TOP_K = 8
+# Chunks scoring below this cosine similarity are not considered relevant.
+MIN_SCORE = 0.2
+MAX_INDEXES_IN_MEMORY = 4
+# Reciprocal-rank fusion constant: a chunk at rank r in a ranking scores 1 / (RRF_K + r).
+RRF_K = 60
+# Candidates taken from each ranking before fusion, as a multiple of k.
+CANDIDATE_FACTOR = 4
+# Keyword input (no question mark or question word) of at most this many terms, all present in the corpus,
+# or naming a section heading exactly, is answered by BM25 alone.
+KEYWORD_QUERY_MAX_TERMS = 2
+QUESTION_WORDS = frozenset("""
+what how why when where which who whom whose is are am was were can could should would will do does did may might
+""".split())
+
+_lock = threading.Lock()
+_indexes = OrderedDict()
+
+
+def get_embedding(client, input, model=EMBEDDING_MODEL):
+    """Returns one embedding (list of floats) per input string."""
+    response = client.embeddings.create(
+        input=input,
+        model=model
+    )
+    return [x.embedding for x in response.data]
+
+
+def embed_corpus(client, texts, model=EMBEDDING_MODEL):
+    """Embeds many texts with the batched, rate-limited client; returns unit-length rows."""
+    with tracing.span("embed", texts=len(texts)):
+        return normalise(embeddings.embed_texts(texts, client, model=model))
+
+
+def normalise(vectors):
+    """Returns float32 row vectors scaled to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def page_text(page):
+    """Flattens a scraped page dict (sections, or headings/paragraphs/lists) into plain text."""
+    if 'sections' in page:
+        return "\n\n".join(html_extract.section_text(section) for section in page['sections'])
+    parts = []
+    for field in ('headings', 'paragraphs', 'lists'):
+        value = page.get(field) or []
+        parts.extend(value if isinstance(value, list) else [value])
+    return "\n".join(part.strip() for part in parts if part and part.strip())
+
+
+def corpus_chunks(scraped_data, max_tokens=CORPUS_CHUNK_TOKENS, overlap_tokens=CORPUS_OVERLAP_TOKENS):
+    """Chunks every successfully scraped page, tagging each chunk with its source URL.
+
+    Sectioned pages are chunked one section at a time, so a chunk never spans
+    two headings and its URL points at its own section.
+    """
+    chunks = []
+    for page in scraped_data:
+        if 'error' in page:
+            continue
+        sections = page.get('sections')
+        if sections is None:
+            sections = [{'heading': None, 'anchor': None, 'text': page_text(page)}]
+        for section in sections:
+            for chunk in chunking.chunk_pages([html_extract.section_text(section)], max_tokens, overlap_tokens):
+                chunk['url'] = f"{page.get('url')}#{section['anchor']}" if section['anchor'] else page.get('url')
+                if section['heading']:
+                    chunk['heading'] = section['heading']
+                chunks.append(chunk)
+    return chunks
+
+
+def build_index(client, chunks, model=EMBEDDING_MODEL):
+    """Embeds `chunks` and returns an index dict {'vectors', 'chunks', 'model', 'hash'}."""
+    if chunks:
+        vectors = embed_corpus(client, [chunk['text'] for chunk in chunks], model)
+    else:
+        vectors = np.zeros((0, 0), dtype=np.float32)
+    return {
+        'vectors': vectors,
+        'chunks': chunks,
+        'model': model,
+        'hash': vector_index.corpus_hash(chunks, model),
+    }
+
+
+def get_index(client, chunks, model=EMBEDDING_MODEL, name=None):
+    """Returns the index for `chunks`, embedding only what no existing index already covers.
+
+    With a `name`, the index is persisted with `vector_index`, reopened
+    memory-mapped, and updated incrementally by content hash when the
+    corpus changes (see `indexer.update_index`).
+    """
+    key = vector_index.corpus_hash(chunks, model)
+    with _lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+
+    if name:
+        index, _ = indexer.update_index(name, chunks, lambda texts: embed_corpus(client, texts, model), model)
+    else:
+        index = build_index(client, chunks, model)
+
+    with _lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES_IN_MEMORY:
+            _indexes.popitem(last=False)
+    return index
+
+
+def search(index, query_vector, k=DEFAULT_TOP_K, min_score=MIN_SCORE):
+    """Returns [(row, score), ...] for the `k` rows most similar to `query_vector`, best first."""
+    vectors = index['vectors']
+    if len(vectors) == 0:
+        return []
+    scores = vectors @ normalise(query_vector).reshape(-1)
+    if 'live' in index:
+        scores[~index['live']] = -np.inf
+    k = min(k, len(scores))
+    # argpartition finds the top k in linear time; only those k are sorted.
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(row), float(scores[row])) for row in top if scores[row] >= min_score and np.isfinite(scores[row])]
+
+
+def embed_query(client, query, model=EMBEDDING_MODEL):
+    """Returns the unit-length embedding of a single query."""
+    with tracing.span("embed_query") as embed_span:
+        embed_span.add(embedding_tokens=chunking.count_tokens(query))
+        return normalise(get_embedding(client, [query], model)[0])
+
+
+def try_embed_query(client, query, model=EMBEDDING_MODEL):
+    """Returns `embed_query(...)`, or None if the embedding API is unavailable."""
+    try:
+        return embed_query(client, query, model)
+    except openai.OpenAIError as e:
+        print(f"[retrieval] query embedding failed, using keyword search only: {e}", file=sys.stderr)
+        return None
+
+
+def is_keyword_query(index, query):
+    """Returns `True` for literal keyword lookups, e.g. "TeSA", "mid-career" or a section heading.
+
+    Questions ("Who is eligible for SkillsFuture credits?") are never keyword
+    queries, however few terms they have.
+    """
+    words = lexical_index.words(query)
+    if "?" in query or QUESTION_WORDS.intersection(words):
+        return False
+    # Hyphenated words count once ("mid-career"), as the user typed them.
+    keywords = {word for word in words if word not in lexical_index.STOPWORDS}
+    lexical = lexical_index.get(index)
+    return ((0 < len(keywords) <= KEYWORD_QUERY_MAX_TERMS and lexical.known(set(lexical_index.tokenize(query))))
+            or lexical.is_heading(query))
+
+
+def query_embedding(client, index, query):
+    """Returns the query embedding `retrieve` would use: None for keyword queries or if the API fails."""
+    if is_keyword_query(index, query):
+        return None
+    return try_embed_query(client, query, index['model'])
+
+
+def fuse(rankings, k):
+    """Merges [(row, score), ...] rankings by reciprocal-rank fusion; returns [(row, fused score), ...]."""
+    fused = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking, 1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])[:k]
+
+
+def retrieve(client, index, query, k=DEFAULT_TOP_K, min_score=MIN_SCORE, query_vector=None, embed=True):
+    """Returns the chunks most relevant to `query`, each with a fused 'score' added.
+
+    BM25 and embedding rankings are fused; `min_score` applies to the cosine
+    similarity. Keyword queries (see `is_keyword_query`) make no API call, and
+    if the embedding API fails the BM25 ranking is used alone. Pass
+    `query_vector` to reuse an embedding the caller already has, or
+    `embed=False` to never call the embedding API.
+    """
+    if len(index['chunks']) == 0:
+        return []
+    candidates = max(k * CANDIDATE_FACTOR, 32)
+    if query_vector is None and embed:
+        query_vector = query_embedding(client, index, query)
+    with tracing.span("retrieve", k=k) as retrieve_span:
+        lexical = lexical_index.get(index).search(query, candidates)
+        semantic = search(index, query_vector, candidates, min_score) if query_vector is not None else []
+        results = [dict(index['chunks'][row], score=score) for row, score in fuse([semantic, lexical], k)]
+        retrieve_span.add(results=len(results), lexical=len(lexical), semantic=len(semantic))
+    return results
@@ -0,0 +1,112 @@
+import numpy as np
+from helper_functions import lexical_index
+
+# """
+# Query-intent router for the chat pages. A small local keyword model, run
+# before any API call, decides how a query is answered:
+#
+#   greeting    only greeting/small-talk words ("hi", "thanks!"): canned reply
+#   off_topic   no career/skills word and no chunk of the corpus shares at
+#               least half of its terms: canned reply
+#   example     one of the page's listed example questions: the answer stored
+#               the first time it was asked for this corpus version
+#   full        everything else: retrieval and the LLM pipeline
+#
+# The route is recorded on the request's trace, and `savings` estimates from
+# the trace log how much time the short-circuited routes saved.
+# """
+
+GREETING, OFF_TOPIC, EXAMPLE, FULL = "greeting", "off_topic", "example", "full"
+
+# A query matches an example question if their term sets overlap at least this much (Jaccard).
+EXAMPLE_MATCH = 0.8
+
+GREETING_TERMS = frozenset("""
+hi hello hey hiya heya yo sup greetings good morning afternoon evening day thanks thank thx ty cheers bye goodbye
+ok okay nice meet there all everyone again much lot great cool
+""".split())
+
+# Words that make a query on-topic even if the corpus happens not to contain them.
+DOMAIN_TERMS = frozenset("""
+career careers job jobs work working worker workers employment employer employers employee unemployed hire hiring
+skill skills skillsfuture upskill upskilling reskill reskilling course courses training train learn learning study
+degree diploma certificate certification qualification programme programmes program programs credit credits subsidy
+subsidies grant grants funding salary pay resume cv interview industry industries sector sectors economy workforce
+mid midcareer pivot switch profession professional role roles occupation internship mentor coaching
+""".split())
+
+
+class Route:
+    """How one query is answered: `kind`, plus the matched `example` or a canned `reply`."""
+
+    def __init__(self, kind, example=None, reply=None):
+        self.kind = kind
+        self.example = example
+        self.reply = reply
+
+    def __repr__(self):
+        return f"Route({self.kind!r})"
+
+
+def _example_list(examples):
+    return "\n".join(f"- {example}" for example in examples)
+
+
+def match_example(query, examples):
+    """Returns the example question `query` is a rewording of, or None."""
+    terms = set(lexical_index.tokenize(query))
+    best, best_overlap = None, 0.0
+    for example in examples:
+        example_terms = set(lexical_index.tokenize(example))
+        overlap = len(terms & example_terms) / len(terms | example_terms) if terms | example_terms else 0.0
+        if overlap > best_overlap:
+            best, best_overlap = example, overlap
+    return best if best_overlap >= EXAMPLE_MATCH else None
+
+
+def route(query, index, examples=(), topic="careers and skills"):
+    """Returns the Route for `query` on a page whose corpus is `index` and whose listed questions are `examples`."""
+    terms = lexical_index.tokenize(query)
+    # A query with no terms at all ("???", "What can I do?") is not a greeting; it goes to the full pipeline.
+    if not terms:
+        return Route(FULL)
+    if all(term in GREETING_TERMS for term in terms):
+        return Route(GREETING, reply=f"Hello! I can answer questions about {topic}. For example, try asking:\n\n"
+                                     f"{_example_list(examples)}")
+
+    example = match_example(query, examples)
+    if example is not None:
+        return Route(EXAMPLE, example=example)
+
+    if not DOMAIN_TERMS.intersection(terms) and not lexical_index.get(index).search(query, k=1):
+        return Route(OFF_TOPIC, reply=f"Sorry, I can only help with questions about {topic}. "
+                                      f"For example, you could ask:\n\n{_example_list(examples)}")
+    return Route(FULL)
+
+
+def savings(records):
+    """Returns one row per (page, route) with request counts and the time saved against the page's full route.
+
+    A short-circuited request saves the median time of that page's 'full'
+    requests minus its own time; pages without full requests yet are skipped.
+    """
+    groups = {}
+    for record in records:
+        if 'route' in record:
+            groups.setdefault((record['page'], record['route']), []).append(record['seconds'])
+
+    rows = []
+    for (page, kind), seconds in sorted(groups.items()):
+        full = groups.get((page, FULL))
+        if full is None:
+            continue
+        full_p50 = float(np.percentile(full, 50))
+        saved = sum(max(full_p50 - s, 0.0) for s in seconds) if kind != FULL else 0.0
+        rows.append({
+            'page': page,
+            'route': kind,
+            'requests': len(seconds),
+            'p50 s': round(float(np.percentile(seconds, 50)), 3),
+            'time saved s': round(saved, 1),
+        })
+    return rows
@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import requests
+
+# """
+# On-disk cache for scraped web pages, shared by every page of the portal.
+# Raw responses are stored per URL with their ETag / Last-Modified validators,
+# and parsed results are memoised per (url, parser) so a rerun never re-parses
+# an unchanged page.
+# """
+
+CACHE_DIR = os.getenv("PORTAL_CACHE_DIR", ".cache")
+DB_PATH = os.path.join(CACHE_DIR, "scrape_cache.sqlite3")
+
+# Fresh for DEFAULT_TTL seconds, then served stale (and revalidated in the
+# background) for a further DEFAULT_STALE_TTL seconds.
+DEFAULT_TTL = int(os.getenv("SCRAPE_CACHE_TTL", 6 * 60 * 60))
+DEFAULT_STALE_TTL = int(os.getenv("SCRAPE_CACHE_STALE_TTL", 7 * 24 * 60 * 60))
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+class OfflineCacheMiss(requests.exceptions.RequestException):
+    """Raised in offline mode when a URL has never been cached."""
+
+
+def is_offline():
+    """Returns `True` if the cache must never touch the network."""
+    return os.getenv("SCRAPE_CACHE_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def _connect(db_path=None):
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            digest TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parsed (
+            url TEXT NOT NULL,
+            parser TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            content TEXT NOT NULL,
+            PRIMARY KEY (url, parser)
+        )""")
+    return conn
+
+
+def read_entry(url, db_path=None):
+    """Returns the cached entry for `url` as a dict, or None."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT body, digest, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {
+        'url': url,
+        'body': bytes(row[0]),
+        'digest': row[1],
+        'etag': row[2],
+        'last_modified': row[3],
+        'fetched_at': row[4],
+    }
+
+
+def store_entry(url, body, etag=None, last_modified=None, fetched_at=None, db_path=None):
+    """Writes a page body into the cache, replacing any previous version."""
+    entry = {
+        'url': url,
+        'body': body,
+        'digest': hashlib.sha256(body).hexdigest(),
+        'etag': etag,
+        'last_modified': last_modified,
+        'fetched_at': time.time() if fetched_at is None else fetched_at,
+    }
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, digest, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body, entry['digest'], etag, last_modified, entry['fetched_at']),
+            )
+    finally:
+        conn.close()
+    return entry
+
+
+def _touch_entry(entry, db_path=None):
+    entry = dict(entry, fetched_at=time.time())
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (entry['fetched_at'], entry['url']))
+    finally:
+        conn.close()
+    return entry
+
+
+def _conditional_headers(entry):
+    headers = {}
+    if entry is not None:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def revalidate_many(entries, db_path=None):
+    """Concurrently refetches URLs, sending conditional headers for cached copies.
+
+    `entries` maps each URL to its cached entry (or None). Returns a dict of
+    URL -> fresh entry, or URL -> `FetchError` for URLs that failed.
+    """
+    # The fetch engine (aiohttp) is only needed once something is actually fetched.
+    from helper_functions import fetch, tracing
+    headers = {url: _conditional_headers(entry) for url, entry in entries.items()}
+    with tracing.span("fetch", urls=len(entries)) as fetch_span:
+        results = fetch.fetch_all(list(entries), headers)
+        fetch_span.add(not_modified=sum(1 for result in results if result['status'] == 304),
+                       errors=sum(1 for result in results if result['error']))
+    fetch.log_latency_report(results, label="scrape cache")
+
+    refreshed = {}
+    for result in results:
+        url, entry = result['url'], entries[result['url']]
+        if result['status'] == 304 and entry is not None:
+            refreshed[url] = _touch_entry(entry, db_path)
+        elif result['error']:
+            refreshed[url] = fetch.FetchError(f"{url}: {result['error']} after {result['attempts']} attempt(s)")
+        else:
+            refreshed[url] = store_entry(
+                url,
+                result['body'],
+                etag=result['headers'].get('ETag'),
+                last_modified=result['headers'].get('Last-Modified'),
+                db_path=db_path,
+            )
+    return refreshed
+
+
+def revalidate(url, entry=None, db_path=None):
+    """Refetches a single URL, raising `FetchError` if it cannot be fetched."""
+    refreshed = revalidate_many({url: entry}, db_path)[url]
+    if isinstance(refreshed, Exception):
+        raise refreshed
+    return refreshed
+
+
+def _revalidate_in_background(entries, db_path):
+    with _revalidating_lock:
+        entries = {url: entry for url, entry in entries.items() if url not in _revalidating}
+        _revalidating.update(entries)
+    if not entries:
+        return
+
+    def worker():
+        try:
+            for url, refreshed in revalidate_many(entries, db_path).items():
+                if isinstance(refreshed, Exception):
+                    print(f"Background revalidation failed: {refreshed}", file=sys.stderr)
+        finally:
+            with _revalidating_lock:
+                _revalidating.difference_update(entries)
+
+    threading.Thread(target=worker, name="scrape-cache-revalidate", daemon=True).start()
+
+
+def get_pages(urls, ttl=None, stale_ttl=None, db_path=None):
+    """Returns a dict of URL -> cache entry, fetching missing or expired pages concurrently.
+
+    URLs that could not be fetched (and have no cached copy) map to the
+    exception instead, so one broken source does not hide the others.
+    """
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    stale_ttl = DEFAULT_STALE_TTL if stale_ttl is None else stale_ttl
+    pages, stale, expired = {}, {}, {}
+    now = time.time()
+
+    for url in urls:
+        entry = read_entry(url, db_path)
+        if is_offline():
+            pages[url] = entry if entry is not None else OfflineCacheMiss(
+                f"{url} is not in the scrape cache (offline mode)")
+        elif entry is not None and now - entry['fetched_at'] <= ttl:
+            pages[url] = entry
+        elif entry is not None and now - entry['fetched_at'] <= ttl + stale_ttl:
+            # Serve the stale copy now and refresh it for the next reader.
+            pages[url] = stale[url] = entry
+        else:
+            expired[url] = entry
+
+    if stale:
+        _revalidate_in_background(stale, db_path)
+    if expired:
+        for url, refreshed in revalidate_many(expired, db_path).items():
+            # Better an old page than no page at all.
+            if isinstance(refreshed, Exception) and expired[url] is not None:
+                refreshed = expired[url]
+            pages[url] = refreshed
+
+    return {url: pages[url] for url in urls}
+
+
+def get_page(url, ttl=None, stale_ttl=None, db_path=None):
+    """Returns the cache entry for `url`, fetching or revalidating as needed."""
+    entry = get_pages([url], ttl=ttl, stale_ttl=stale_ttl, db_path=db_path)[url]
+    if isinstance(entry, Exception):
+        raise entry
+    return entry
+
+
+def _parse_entry(conn, entry, parse, parser_key):
+    row = conn.execute(
+        "SELECT content FROM parsed WHERE url = ? AND parser = ? AND digest = ?",
+        (entry['url'], parser_key, entry['digest']),
+    ).fetchone()
+    if row is not None:
+        return json.loads(row[0])
+
+    from helper_functions import tracing
+    with tracing.span("parse", kind="html"):
+        content = parse(entry['body'])
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO parsed (url, parser, digest, content) VALUES (?, ?, ?, ?)",
+            (entry['url'], parser_key, entry['digest'], json.dumps(content)),
+        )
+    return content
+
+
+def get_parsed_many(urls, parse, parser_key, ttl=None, stale_ttl=None, db_path=None):
+    """Returns `parse(body)` for each URL, in order, reusing stored results while bodies are unchanged.
+
+    `parse` must return JSON-serialisable data. Bump `parser_key` whenever the
+    parsing logic changes so old results are not served. Failed URLs yield
+    their exception in place of a parsed result.
+    """
+    pages = get_pages(urls, ttl=ttl, stale_ttl=stale_ttl, db_path=db_path)
+    conn = _connect(db_path)
+    try:
+        return [
+            entry if isinstance(entry, Exception) else _parse_entry(conn, entry, parse, parser_key)
+            for entry in pages.values()
+        ]
+    finally:
+        conn.close()
+
+
+def get_parsed(url, parse, parser_key, ttl=None, stale_ttl=None, db_path=None):
+    """Returns `parse(body)` for a single URL, raising if it cannot be fetched."""
+    content = get_parsed_many([url], parse, parser_key, ttl=ttl, stale_ttl=stale_ttl, db_path=db_path)[0]
+    if isinstance(content, Exception):
+        raise content
+    return content
+
+
+def main(argv=None):
+    """Command line helper to pre-seed or inspect the cache for offline use."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or pre-seed the portal scrape cache.")
+    parser.add_argument("--db", default=None, help="path to the cache database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed = commands.add_parser("seed", help="store a saved HTML/PDF file under a URL")
+    seed.add_argument("url")
+    seed.add_argument("file")
+    commands.add_parser("list", help="list cached URLs and their age")
+    args = parser.parse_args(argv)
+
+    if args.command == "seed":
+        with open(args.file, "rb") as f:
+            entry = store_entry(args.url, f.read(), db_path=args.db)
+        print(f"Seeded {args.url} ({len(entry['body'])} bytes)")
+    else:
+        conn = _connect(args.db)
+        try:
+            rows = conn.execute("SELECT url, length(body), fetched_at FROM pages ORDER BY url").fetchall()
+        finally:
+            conn.close()
+        for url, size, fetched_at in rows:
+            print(f"{time.time() - fetched_at:10.0f}s  {size:>9} bytes  {url}")
+
+
+if __name__ == "__main__":
+    main()
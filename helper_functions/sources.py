@@ -0,0 +1,72 @@
+import requests
+from helper_functions import scrape_cache, html_extract, report_library
+
+# """
+# The official sources behind each page of the portal, and how they are parsed.
+# Shared by the pages themselves and by the out-of-band index refresh.
+# """
+
+CAREER_GUIDANCE_URLS = [
+    "https://content.mycareersfuture.gov.sg/stressed-interview-outfits-guide/",
+    "https://content.mycareersfuture.gov.sg/25-soft-skills-make-your-resume-stand-out/",
+    "https://content.mycareersfuture.gov.sg/fresh-grad-no-experience-how-get-first-job/",
+    "https://content.mycareersfuture.gov.sg/mid-career-plateau-30s-check-career-health/",
+    "https://content.mycareersfuture.gov.sg/career-guidance-middle-aged-singapore-polaris-wsg/",
+    "https://content.mycareersfuture.gov.sg/futureproof-your-career-in-the-age-of-ai-6-expert-career-specialist/",
+    "https://content.mycareersfuture.gov.sg/jobs-skills-consider-second-half-career-mature-worker/",
+    "https://content.mycareersfuture.gov.sg/career-resilience-skills-mindsets-relevance-industries/",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/education-career-personal-development/skillsfuture-advice.html"
+]
+
+SKILLSFUTURE_URLS = [
+    "https://www.skillsfuture.gov.sg/initiatives/early-career/credit",
+    "https://www.skillsfuture.gov.sg/initiatives/early-career/skills-framework",
+    "https://www.skillsfuture.gov.sg/skills-framework/skills-frameworks-faq/",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/education-career-personal-development/SkillsFuture_Credit.html",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/how-to-guides/myskillsfuture-course-search-guide.html",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/how-to-guides/Here_is_How_SkillsFuture_Makes_Upskilling_Easier.html",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/how-to-guides/the-complete-skillsfuture-credit-guide-for-your-next-career-move.html",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/how-to-guides/enjoy-peace-of-mind-as-you-upskill.html",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/education-career-personal-development/use_SFC_for_online_subscriptions_and_courses.html",
+    "https://www.skillsfuture.gov.sg/initiatives/early-career/tesa",
+    "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/education-career-personal-development/SkillsFuture_Level-Up_Programme.html",
+    "https://programmes.myskillsfuture.gov.sg/WorkStudyIndividualProgrammes/Programme_Summary.aspx"
+]
+
+# The report library (reports.json, see report_library.py): every report PDF the report page can search.
+REPORT_LIBRARY = report_library.LIBRARY
+# Report PDFs by index name.
+REPORTS = {name: entry['url'] for name, entry in REPORT_LIBRARY.items()}
+
+
+# Each web corpus: its source URLs, parser, and the parser version key used by the scrape cache.
+# Both use the structured extractor: boilerplate-free, heading-scoped sections (see html_extract).
+CORPORA = {
+    'career_guidance': {
+        'urls': CAREER_GUIDANCE_URLS,
+        'parse': html_extract.extract_sections,
+        'parser_key': "sections:v1",
+    },
+    'skillsfuture_chatbot': {
+        'urls': SKILLSFUTURE_URLS,
+        'parse': html_extract.extract_sections,
+        'parser_key': "sections:v1",
+    },
+}
+
+
+def scrape_corpus(name, ttl=None, stale_ttl=None):
+    """Returns the scraped pages of corpus `name`, in URL order.
+
+    Each page is a dict with its 'url'; pages that could not be fetched are
+    {'url', 'error'} instead. `ttl`/`stale_ttl` override the scrape cache
+    defaults (0 forces revalidation).
+    """
+    corpus = CORPORA[name]
+    pages = scrape_cache.get_parsed_many(corpus['urls'], corpus['parse'], corpus['parser_key'],
+                                         ttl=ttl, stale_ttl=stale_ttl)
+    return [
+        {'url': url, 'error': f"Error fetching data from {url}: {page}"}
+        if isinstance(page, requests.exceptions.RequestException) else dict(page, url=url)
+        for url, page in zip(corpus['urls'], pages)
+    ]
@@ -0,0 +1,106 @@
+import re
+import sys
+import time
+from helper_functions import chunking, tracing
+
+# """
+# Streaming helpers for the Step 1 / Step 2 / Step 3 answer format. The model
+# streams its reasoning first; only the text after the final "Step 3:####"
+# marker is user-facing, so `final_section` swallows everything before it and
+# passes the rest through token by token.
+# """
+
+DELIMITER = "####"
+
+
+def stream_chat(client, messages, model="gpt-4o-mini", max_tokens=2048, temperature=0.7):
+    """Yields the content deltas of a streamed chat completion."""
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+    )
+    text = []
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            text.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    # Streamed responses carry no usage, so the completion is counted locally.
+    tracing.add(completion_tokens=chunking.count_tokens("".join(text)))
+
+
+async def astream_chat(client, messages, model="gpt-4o-mini", max_tokens=2048, temperature=0.7):
+    """Async counterpart of `stream_chat` for an AsyncOpenAI client."""
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+    )
+    text = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            text.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    tracing.add(completion_tokens=chunking.count_tokens("".join(text)))
+
+
+def final_section(deltas, final_step=3, delimiter=DELIMITER):
+    """Yields only the text after the `Step <final_step>:<delimiter>` marker.
+
+    If the marker never appears, falls back to what the non-streaming code
+    did: everything after the last delimiter.
+    """
+    marker = re.compile(rf"Step\s*{final_step}\s*:\s*{re.escape(delimiter)}\s*")
+    buffer = ""
+    searched = 0
+    for delta in deltas:
+        buffer += delta
+        match = marker.search(buffer, max(0, searched - 32))
+        if match:
+            break
+        # Only re-scan the tail next time; the marker is short.
+        searched = len(buffer)
+    else:
+        tail = buffer.split(delimiter)[-1].lstrip()
+        if tail:
+            yield tail
+        return
+
+    # Drop the whitespace between the marker and the answer, which may arrive in later deltas.
+    pending = buffer[match.end():]
+    for delta in deltas:
+        if pending is not None:
+            pending = (pending + delta).lstrip()
+            if not pending:
+                continue
+            delta, pending = pending, None
+        yield delta
+    if pending:
+        yield pending
+
+
+def timed(deltas, stats=None, label="stream"):
+    """Passes deltas through, recording time to first visible token and total time.
+
+    Timing starts when the generator is first advanced. Pass a dict as
+    `stats` to receive 'ttft', 'total' and 'chunks'.
+    """
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for delta in deltas:
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+        yield delta
+    total = time.perf_counter() - started
+    if stats is not None:
+        stats.update({'ttft': first, 'total': total, 'chunks': count})
+    tracing.update(ttft=first, chunks=count)
+    first_text = f"{first:.2f}s" if first is not None else "n/a"
+    print(f"[{label}] time to first visible token {first_text}, total {total:.2f}s, {count} chunks",
+          file=sys.stderr)
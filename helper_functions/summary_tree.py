@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import tempfile
+import time
+import bisect
+import asyncio
+import threading
+from collections import OrderedDict
+import numpy as np
+from helper_functions import report_cache, chunking, map_reduce, prompt_budget, retrieval, vector_index, tracing
+
+# """
+# Summary-tree index of a report. The leaves are the chunks of the report's
+# vector index. Each chunk is summarised once, and the chunk summaries are
+# rolled up into section summaries (sections follow the headings detected in
+# the PDF text, merged or split to a token budget), then into larger parts,
+# up to one summary of the whole document:
+#
+#   document
+#   ├── part ─ section ─ chunk, chunk, ...
+#   └── part ─ section ─ ...
+#
+# Every node is searchable: summaries are embedded at build time, and leaves
+# reuse the chunk vectors of the report index. A query picks the best-ranked
+# nodes of any level, skipping nodes already covered by a chosen ancestor or
+# descendant, up to TREE_TOP_K nodes. Broad questions match a few high-level
+# summaries; narrow ones match specific chunks. Either way a query costs at
+# most TREE_TOP_K map calls plus the reduce, however long the report is.
+#
+# The tree is built offline with the precomputed answers (report_answers.py)
+# and stored in .cache/reports/trees/<name>.json (+ .npy for the vectors).
+# """
+
+TREES_DIR = os.path.join(report_cache.REPORTS_DIR, "trees")
+# Bump when the tree layout or the summary prompts change, so trees are rebuilt.
+TREE_VERSION = 2
+# Child summaries are rolled up into one parent node up to this many tokens.
+SECTION_TOKENS = int(os.getenv("REPORT_SECTION_TOKENS", 1500))
+MAX_LEVELS = 6
+SUMMARY_CONCURRENCY = 4
+# Nodes answered per query, and the token budget they share.
+TREE_TOP_K = int(os.getenv("REPORT_TREE_TOP_K", 6))
+TREE_CONTEXT_TOKENS = 4000
+MAX_TREES_IN_MEMORY = 4
+
+_lock = threading.Lock()
+_trees = OrderedDict()
+
+
+def _paths(name):
+    return os.path.join(TREES_DIR, f"{name}.json"), os.path.join(TREES_DIR, f"{name}.npy")
+
+
+def _headings(pages):
+    # (page, offset) positions and titles of the heading lines of the report, in reading order.
+    positions, titles = [], []
+    for page_number, text in enumerate(pages, 1):
+        for offset, unit, heading in chunking.iter_units(text):
+            if heading:
+                positions.append((page_number, offset))
+                titles.append(unit)
+    return positions, titles
+
+
+def _sections(leaves, pages):
+    """Groups consecutive leaves into sections by heading, merged or split to SECTION_TOKENS of summaries."""
+    positions, titles = _headings(pages)
+    runs = []  # [heading index, leaves], consecutive leaves under the same heading
+    for leaf in leaves:
+        heading = bisect.bisect_right(positions, (leaf['first_page'], leaf['offset'])) - 1
+        if runs and runs[-1][0] == heading:
+            runs[-1][1].append(leaf)
+        else:
+            runs.append([heading, [leaf]])
+
+    def count(leaf):
+        return chunking.count_tokens(leaf['summary'])
+
+    sections, current, current_tokens, current_title = [], [], 0, None
+    for heading, run in runs:
+        title = titles[heading] if heading >= 0 else None
+        run_tokens = sum(count(leaf) for leaf in run)
+        if current and current_tokens + run_tokens > SECTION_TOKENS:
+            sections.append((current_title, current))
+            current, current_tokens = [], 0
+        if run_tokens > SECTION_TOKENS:
+            # A long section is split into budget-sized parts.
+            for group in map_reduce.group_by_budget(run, SECTION_TOKENS, count):
+                sections.append((title, group))
+            continue
+        if not current:
+            current_title = title
+        current.extend(run)
+        current_tokens += run_tokens
+    if current:
+        sections.append((current_title, current))
+    return sections
+
+
+async def _summarise(async_client, semaphore, node, texts, title):
+    first, last = node['first_page'], node['last_page']
+
+    def render(parts):
+        joined = "\n".join(parts)
+        if node['level'] == 0:
+            tree_prompt = f"""
+            Below is a passage from page {first} of the {title}.
+            Summarise it in two or three sentences, keeping the sectors, skills and figures it mentions.
+
+            Passage:
+            {joined}
+            """
+        else:
+            tree_prompt = f"""
+            Below are summaries of consecutive passages from pages {first} to {last} of the {title}.
+            Combine them into one summary paragraph of the whole span,
+            keeping every distinct finding, sector, skill and figure, and dropping repetition.
+
+            Summaries:
+            {joined}
+            """
+        return [{'role': 'system', 'content': tree_prompt}]
+
+    async with semaphore:
+        with tracing.span("llm.tree", level=node['level']):
+            response = await async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=prompt_budget.pack_messages(render, texts, max_tokens=256, label="report_tree"),
+                max_tokens=256,
+                temperature=0.3
+            )
+            tracing.record_usage(response.usage)
+    node['summary'] = response.choices[0].message.content.strip()
+
+
+async def _build_nodes(async_client, index, pages, title):
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    live = index.get('live')
+    leaves = [
+        {'level': 0, 'row': row, 'title': None, 'text': chunk['text'], 'first_page': chunk.get('page', 1),
+         'last_page': chunk.get('end_page', chunk.get('page', 1)), 'offset': chunk.get('offset', 0)}
+        for row, chunk in enumerate(index['chunks'])
+        if not chunk.get('deleted') and (live is None or live[row])
+    ]
+    leaves.sort(key=lambda leaf: (leaf['first_page'], leaf['offset']))
+    await asyncio.gather(*[_summarise(async_client, semaphore, leaf, [leaf['text']], title) for leaf in leaves])
+
+    def make_parent(level, title, children):
+        return {'level': level, 'title': title, 'children': children,
+                'first_page': children[0]['first_page'], 'last_page': children[-1]['last_page']}
+
+    nodes = list(leaves)
+    level_nodes = [make_parent(1, title, group) for title, group in _sections(leaves, pages)] if leaves else []
+    level = 1
+    while level_nodes:
+        await asyncio.gather(*[
+            _summarise(async_client, semaphore, node, [child['summary'] for child in node['children']], title)
+            for node in level_nodes
+        ])
+        nodes.extend(level_nodes)
+        if len(level_nodes) == 1:
+            break
+        level += 1
+        groups = map_reduce.group_by_budget(level_nodes, SECTION_TOKENS,
+                                            lambda node: chunking.count_tokens(node['summary']))
+        if len(groups) == len(level_nodes) or level >= MAX_LEVELS:
+            # Nothing merges any more: one document node over everything left.
+            groups = [level_nodes]
+        level_nodes = [make_parent(level, None, group) for group in groups]
+
+    # Flatten to a list with integer ids and parent/children links.
+    for node_id, node in enumerate(nodes):
+        node['id'] = node_id
+    for node in nodes:
+        children = node.pop('children', [])
+        node['children'] = [child['id'] for child in children]
+        for child in children:
+            child['parent'] = node['id']
+        if node['level'] > 0:
+            node['text'] = node['summary']
+    return nodes
+
+
+def build(client, name, report, index, title, force=False):
+    """Builds and stores the summary tree of report `name` unless one exists for this index version.
+
+    `report` is the report_cache artifact the index was built from, and
+    `title` the report's library title, used in the summary prompts. Returns
+    {'built': bool, 'nodes': count, 'levels': count, 'hash': tree hash}.
+    """
+    from helper_functions import aio, embeddings
+    json_path, vectors_path = _paths(name)
+    stored = _read(json_path)
+    if (not force and stored is not None and stored.get('version') == TREE_VERSION
+            and stored.get('index_hash') == index['hash'] and stored.get('title') == title):
+        return {'built': False, 'nodes': len(stored['nodes']), 'levels': _levels(stored['nodes']),
+                'hash': stored['tree_hash']}
+
+    started = time.perf_counter()
+    async_client = embeddings.async_client_for(client, max_retries=2)
+    nodes = aio.run(_build_nodes(async_client, index, report['pages'], title))
+    summaries = [node['summary'] for node in nodes if node['level'] > 0]
+    vectors = retrieval.embed_corpus(client, summaries, index['model']) if summaries else \
+        np.zeros((0, 0), dtype=np.float32)
+
+    stored = {
+        'version': TREE_VERSION,
+        'digest': report['digest'],
+        'index_hash': index['hash'],
+        'title': title,
+        'tree_hash': vector_index.corpus_hash(nodes, index['model']),
+        'built_at': time.time(),
+        'nodes': nodes,
+    }
+    os.makedirs(TREES_DIR, exist_ok=True)
+    # The vectors go first and both files are replaced atomically; `load` checks they agree.
+    fd, tmp_vectors = tempfile.mkstemp(dir=TREES_DIR, prefix=f"{name}.", suffix=".tmp.npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.asarray(vectors, dtype=np.float32))
+    os.replace(tmp_vectors, vectors_path)
+    fd, tmp_json = tempfile.mkstemp(dir=TREES_DIR, prefix=f"{name}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(stored, f)
+    os.replace(tmp_json, json_path)
+    print(f"[summary_tree] {name}: {len(nodes)} nodes in {_levels(nodes)} levels "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return {'built': True, 'nodes': len(nodes), 'levels': _levels(nodes), 'hash': stored['tree_hash']}
+
+
+def _levels(nodes):
+    return max((node['level'] for node in nodes), default=-1) + 1
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(name, index):
+    """Returns the summary tree of report `name` as a searchable index dict, or None.
+
+    The tree must have been built from `index` (the same index version). The
+    result has the usual index keys ('chunks' are the nodes, 'vectors',
+    'model', 'hash'), so it can be searched with `retrieval.retrieve`.
+    """
+    json_path, vectors_path = _paths(name)
+    try:
+        key = (name, index['hash'], os.path.getmtime(json_path))
+    except OSError:
+        return None
+    with _lock:
+        if key in _trees:
+            _trees.move_to_end(key)
+            return _trees[key]
+
+    stored = _read(json_path)
+    if stored is None or stored.get('version') != TREE_VERSION or stored.get('index_hash') != index['hash']:
+        return None
+    nodes = stored['nodes']
+    try:
+        summary_vectors = np.load(vectors_path)
+    except (OSError, ValueError):
+        return None
+    if len(summary_vectors) != sum(1 for node in nodes if node['level'] > 0):
+        return None  # caught between the two writes of a rebuild
+
+    summary_rows = iter(range(len(summary_vectors)))
+    vectors = np.stack([index['vectors'][node['row']] if node['level'] == 0 else summary_vectors[next(summary_rows)]
+                        for node in nodes]) if nodes else np.zeros((0, 0), dtype=np.float32)
+    tree = {'chunks': nodes, 'vectors': vectors, 'model': index['model'], 'hash': stored['tree_hash']}
+    with _lock:
+        _trees[key] = tree
+        while len(_trees) > MAX_TREES_IN_MEMORY:
+            _trees.popitem(last=False)
+    return tree
+
+
+def _related(nodes, node_id):
+    # A node's ancestors and descendants, which a chosen node already covers.
+    related = set()
+    parent = nodes[node_id].get('parent')
+    while parent is not None:
+        related.add(parent)
+        parent = nodes[parent].get('parent')
+    stack = list(nodes[node_id]['children'])
+    while stack:
+        child = stack.pop()
+        related.add(child)
+        stack.extend(nodes[child]['children'])
+    return related
+
+
+def select(client, tree, query, query_vector=None, k=TREE_TOP_K, max_tokens=TREE_CONTEXT_TOKENS):
+    """Returns up to `k` tree nodes that best answer `query`, none covering another, best first."""
+    nodes = tree['chunks']
+    ranked = retrieval.retrieve(client, tree, query, k=k * retrieval.CANDIDATE_FACTOR, min_score=0.0,
+                                query_vector=query_vector, embed=False)
+    with tracing.span("tree_select") as select_span:
+        selected, covered, tokens = [], set(), 0
+        for node in ranked:
+            if node['id'] in covered:
+                continue
+            node_tokens = chunking.count_tokens(node['text'])
+            if selected and tokens + node_tokens > max_tokens:
+                continue
+            selected.append(node)
+            tokens += node_tokens
+            covered |= _related(nodes, node['id']) | {node['id']}
+            if len(selected) >= k:
+                break
+        select_span.add(nodes=len(selected), summary_nodes=sum(1 for node in selected if node['level'] > 0))
+    return selected
+
+
+def sections(tree):
+    """Returns the section nodes (level 1) of a loaded tree, in page order."""
+    return [node for node in tree['chunks'] if node['level'] == 1]
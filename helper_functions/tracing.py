@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+import numpy as np
+from helper_functions import scrape_cache
+
+# """
+# Lightweight per-request tracing. A page wraps one user request in
+# `tracing.trace(page)`, and the work inside it in `tracing.span(stage)`
+# context managers (fetch, parse, retrieve, each LLM call, render). Spans
+# record wall time plus counters such as prompt/completion tokens and cache
+# hits. The current trace is a context variable, so spans opened in
+# coroutines on the shared event loop (aio.run, pipeline.Pipeline) attach to
+# the request that scheduled them; outside a trace a span does nothing.
+#
+# Finished traces are appended as JSON lines to .cache/traces.jsonl, which is
+# rotated at TRACE_MAX_BYTES (traces.jsonl.1, .2, ...). The Performance page
+# aggregates them per stage.
+# """
+
+TRACE_PATH = os.path.join(scrape_cache.CACHE_DIR, "traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", 5_000_000))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", 3))
+ENABLED = os.getenv("PORTAL_TRACING", "1") != "0"
+
+_current_trace = ContextVar("portal_trace", default=None)
+_current_span = ContextVar("portal_span", default=None)
+_sink_lock = threading.Lock()
+
+
+class Span:
+    """One timed stage of a request, with numeric counters."""
+
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = dict(attrs)
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.error = None
+
+    def add(self, **counters):
+        """Adds to this span's counters (e.g. completion_tokens=120, cache_hits=1)."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, **counters):
+        """Overwrites counters, e.g. an estimate with the count the API reported."""
+        self.counters.update(counters)
+
+
+class _NullSpan:
+    """Stands in for a span when no request is being traced."""
+
+    def add(self, **counters):
+        pass
+
+    def set(self, **counters):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """The spans of one request (or one background refresh)."""
+
+    def __init__(self, page, attrs):
+        self.id = uuid.uuid4().hex
+        self.page = page
+        self.attrs = dict(attrs)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self, seconds, error=None):
+        with self._lock:
+            spans = [
+                {'stage': s.stage, 'start': round(s.start - self.start, 4), 'seconds': round(s.seconds, 4),
+                 **s.attrs, **s.counters, **({'error': s.error} if s.error else {})}
+                for s in sorted(self.spans, key=lambda s: s.start)
+            ]
+            record = {'id': self.id, 'page': self.page, 'ts': self.started_at, 'seconds': round(seconds, 4),
+                      **self.attrs, 'spans': spans}
+        if error:
+            record['error'] = error
+        return record
+
+
+@contextmanager
+def trace(page, **attrs):
+    """Traces one request of `page`; yields the Trace. The record is written when the block exits."""
+    if not ENABLED:
+        yield None
+        return
+    current = Trace(page, attrs)
+    token = _current_trace.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_trace.reset(token)
+        write(current.to_dict(time.perf_counter() - current.start, error))
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Times `stage` within the current trace; yields the Span (a no-op object outside a trace)."""
+    current = _current_trace.get()
+    if current is None:
+        yield _NULL_SPAN
+        return
+    opened = Span(stage, attrs)
+    token = _current_span.set(opened)
+    try:
+        yield opened
+    except BaseException as e:
+        opened.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        opened.seconds = time.perf_counter() - opened.start
+        current._record(opened)
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # An async generator closed from another context; the variable dies with that context anyway.
+            pass
+
+
+def annotate(**attrs):
+    """Sets attributes on the current trace (e.g. how the request was routed); outside a trace they are dropped."""
+    current = _current_trace.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def add(**counters):
+    """Adds counters to the innermost open span; outside a span they are dropped."""
+    opened = _current_span.get()
+    if opened is not None:
+        opened.add(**counters)
+
+
+def update(**counters):
+    """Overwrites counters on the innermost open span (e.g. a time to first token)."""
+    opened = _current_span.get()
+    if opened is not None:
+        opened.set(**counters)
+
+
+def record_usage(usage):
+    """Records the token counts an OpenAI response reported on the innermost open span."""
+    opened = _current_span.get()
+    if opened is not None and usage is not None:
+        opened.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+
+def _rotate(path):
+    for number in range(TRACE_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{path}.{number}"):
+            os.replace(f"{path}.{number}", f"{path}.{number + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def write(record, path=None):
+    """Appends one trace record to the sink, rotating it when it grows past TRACE_MAX_BYTES."""
+    path = path or TRACE_PATH
+    line = json.dumps(record) + "\n"
+    with _sink_lock:
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) + len(line) > TRACE_MAX_BYTES:
+                _rotate(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            # Tracing must never break a request.
+            pass
+
+
+def read_traces(since=None, path=None):
+    """Returns the stored trace records, oldest first, optionally only those started after `since`."""
+    path = path or TRACE_PATH
+    records = []
+    for file_path in [f"{path}.{n}" for n in range(TRACE_BACKUPS, 0, -1)] + [path]:
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if since is None or record.get('ts', 0) >= since:
+                        records.append(record)
+        except OSError:
+            continue
+    return records
+
+
+def aggregate(records):
+    """Returns one row per (page, stage) with latency percentiles, tokens and cache hits.
+
+    Each request also counts as a 'request' stage with its end-to-end time.
+    """
+    groups = {}
+    for record in records:
+        spans = record.get('spans', [])
+        request = {
+            'stage': "request",
+            'seconds': record['seconds'],
+            'error': record.get('error'),
+            **{key: sum(s.get(key, 0) for s in spans)
+               for key in ('prompt_tokens', 'completion_tokens', 'cache_hits', 'cache_misses')},
+        }
+        for entry in [request] + spans:
+            groups.setdefault((record['page'], entry['stage']), []).append(entry)
+
+    rows = []
+    for (page, stage), entries in sorted(groups.items()):
+        seconds = np.array([entry['seconds'] for entry in entries])
+        hits = sum(entry.get('cache_hits', 0) for entry in entries)
+        misses = sum(entry.get('cache_misses', 0) for entry in entries)
+        rows.append({
+            'page': page,
+            'stage': stage,
+            'count': len(entries),
+            'p50 s': round(float(np.percentile(seconds, 50)), 3),
+            'p95 s': round(float(np.percentile(seconds, 95)), 3),
+            'mean s': round(float(seconds.mean()), 3),
+            'prompt tokens': sum(entry.get('prompt_tokens', 0) for entry in entries),
+            'completion tokens': sum(entry.get('completion_tokens', 0) for entry in entries),
+            'cache hit rate': round(hits / (hits + misses), 2) if hits + misses else None,
+            'errors': sum(1 for entry in entries if entry.get('error')),
+        })
+    return rows
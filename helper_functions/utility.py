@@ -1,6 +1,7 @@
 import streamlit as st  
 import random  
 import hmac  
+from datetime import datetime
 
 # """  
 # This file contains the common components used in the Streamlit App.  
@@ -26,4 +27,41 @@ def check_password():
     )  
     if "password_correct" in st.session_state:  
         st.error("😕 Password incorrect")  
-    return False
\ No newline at end of file
+    return False
+
+
+def check_admin():  
+    """Returns `True` if the user also entered the admin password (`admin_password` in the secrets)."""  
+    def admin_password_entered():  
+        """Checks whether the admin password entered by the user is correct."""  
+        if hmac.compare_digest(st.session_state["admin_password"], st.secrets["admin_password"]):  
+            st.session_state["admin_correct"] = True  
+            del st.session_state["admin_password"]  # Don't store the password.  
+        else:  
+            st.session_state["admin_correct"] = False  
+    if st.session_state.get("admin_correct", False):  
+        return True  
+    if "admin_password" not in st.secrets:  
+        st.info("This page is for administrators; set `admin_password` in the app secrets to enable it.")  
+        return False  
+    st.text_input(  
+        "Admin password", type="password", on_change=admin_password_entered, key="admin_password"  
+    )  
+    if "admin_correct" in st.session_state:  
+        st.error("😕 Admin password incorrect")  
+    return False
+
+
+def show_refresh_status():
+    """Shows when the scraped content was last refreshed, and how long it took, in the sidebar."""
+    # Imported here so the login screen, which every page shows first, stays light.
+    from helper_functions import refresher
+    status = refresher.read_status()
+    if not status:
+        st.sidebar.caption("🔄 Content is being prepared for the first time.")
+        return
+    refreshed_at = datetime.fromtimestamp(status['finished_at']).strftime("%d %b %Y, %H:%M")
+    st.sidebar.caption(f"🔄 Content last refreshed {refreshed_at} (took {status['seconds']:.0f}s)")
+    failed = [name for name, target in status.get('targets', {}).items() if not target.get('ok')]
+    if failed:
+        st.sidebar.caption(f"Could not refresh {', '.join(failed)}; showing the previous version.")
@@ -0,0 +1,147 @@
+import os
+import json
+import glob
+import tempfile
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from helper_functions import scrape_cache
+
+# """
+# On-disk vector index format. Each named index is a directory holding
+#
+#   vectors-<hash>.npy   float32/float16 matrix, one unit-length row per chunk
+#   meta-<hash>.json     sidecar: model, dtype, corpus hash and per-chunk
+#                        metadata (url, page, offset, tokens, content hash, text,
+#                        and a 'deleted' tombstone flag, see indexer.py)
+#   current.json         points at the live <hash>; replaced atomically
+#
+# Vectors are opened with np.load(mmap_mode="r"), so every session and every
+# process on the host share the same page-cache copy instead of each holding
+# Python lists of floats.
+# """
+
+INDEX_DIR = os.path.join(scrape_cache.CACHE_DIR, "indexes")
+# Chunk fields kept in the sidecar; anything else on a chunk dict is dropped.
+META_FIELDS = ('url', 'heading', 'page', 'end_page', 'offset', 'tokens', 'hash', 'deleted', 'text')
+# Indexes kept open per process; the least recently used is closed first.
+MAX_OPEN_INDEXES = int(os.getenv("MAX_OPEN_INDEXES", 8))
+
+_lock = threading.Lock()
+_open_indexes = OrderedDict()
+
+
+def chunk_hash(text):
+    """Returns the content hash stored for a chunk."""
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def corpus_hash(chunks, model):
+    """Returns a hash identifying a list of chunks embedded with `model`."""
+    digest = hashlib.sha256(model.encode())
+    for chunk in chunks:
+        digest.update(chunk['text'].encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _index_dir(name):
+    return os.path.join(INDEX_DIR, name)
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def save_index(name, index, dtype=np.float32):
+    """Writes `index` (as built by `retrieval.build_index`) and makes it the live version of `name`."""
+    directory = _index_dir(name)
+    os.makedirs(directory, exist_ok=True)
+    version = index['hash']
+
+    vectors_path = os.path.join(directory, f"vectors-{version}.npy")
+    # Unique temporary names, so concurrent writers of the same version never share one.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(vectors_path), prefix=os.path.basename(vectors_path) + ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.ascontiguousarray(index['vectors'], dtype=dtype))
+    os.replace(tmp_path, vectors_path)
+
+    chunks = [
+        {field: chunk[field] for field in META_FIELDS if field in chunk}
+        for chunk in index['chunks']
+    ]
+    for chunk in chunks:
+        chunk.setdefault('hash', chunk_hash(chunk['text']))
+    _write_json(os.path.join(directory, f"meta-{version}.json"), {
+        'model': index['model'],
+        'hash': version,
+        'dtype': np.dtype(dtype).name,
+        'chunks': chunks,
+    })
+
+    # Readers only ever follow current.json, so the switch is atomic.
+    _write_json(os.path.join(directory, "current.json"), {'hash': version})
+    _remove_old_versions(directory, keep=version)
+
+
+def _remove_old_versions(directory, keep):
+    for path in glob.glob(os.path.join(directory, "vectors-*.npy")) + glob.glob(os.path.join(directory, "meta-*.json")):
+        if keep not in os.path.basename(path):
+            try:
+                os.remove(path)
+            except OSError:
+                # Another process may still be mapping it; it will be removed next time.
+                pass
+
+
+def current_version(name):
+    """Returns the hash of the live version of index `name`, or None if it was never saved."""
+    try:
+        with open(os.path.join(_index_dir(name), "current.json"), encoding="utf-8") as f:
+            return json.load(f)['hash']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_index(name):
+    """Opens the live version of index `name` (vectors memory-mapped), or returns None.
+
+    The MAX_OPEN_INDEXES most recently used indexes are kept open per process,
+    so repeated calls only re-read the small current.json pointer.
+    """
+    version = current_version(name)
+    if version is None:
+        return None
+    with _lock:
+        index = _open_indexes.get(name)
+        if index is not None and index['hash'] == version:
+            _open_indexes.move_to_end(name)
+            return index
+
+    directory = _index_dir(name)
+    try:
+        with open(os.path.join(directory, f"meta-{version}.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(directory, f"vectors-{version}.npy"), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    index = {
+        'vectors': vectors,
+        'chunks': meta['chunks'],
+        'model': meta['model'],
+        'hash': meta['hash'],
+    }
+    if any(chunk.get('deleted') for chunk in meta['chunks']):
+        # Tombstoned rows stay in the matrix but are masked out of searches.
+        index['live'] = np.array([not chunk.get('deleted') for chunk in meta['chunks']])
+    with _lock:
+        _open_indexes[name] = index
+        _open_indexes.move_to_end(name)
+        while len(_open_indexes) > MAX_OPEN_INDEXES:
+            _open_indexes.popitem(last=False)
+    return index
@@ -1,32 +1,7 @@
-import os
-import json
-import requests
-import openai
 import streamlit as st
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-from openai import OpenAI
-import re
-from helper_functions.utility import check_password 
-
-# Load environment variables (OpenAI API key)
-if load_dotenv('.env'):
-   # for local development
-   OPENAI_KEY = os.getenv('OPENAI_API_KEY')
-else:
-   OPENAI_KEY = st.secrets['OPENAI_API_KEY']
-
-# Pass the API Key to the OpenAI Client
-client = OpenAI(api_key=OPENAI_KEY)
+from helper_functions.utility import check_password, show_refresh_status
 # Some other code here are omitted for brevity
 
-def get_embedding(input, model='text-embedding-3-small'):
-    response = client.embeddings.create(
-        input=input,
-        model=model
-    )
-    return [x.embedding for x in response.data]
-
 # region <--------- Streamlit App Configuration --------->
 st.set_page_config(
     layout="centered",
@@ -43,195 +18,170 @@ st.write(
 # Check if the password is correct.  
 if not check_password():  
     st.stop()
+show_refresh_status()
 
-# Examples of questions
-st.subheader("Example Questions:")
-st.markdown(
-        "- **What are the best ways to upskill in a changing job market?**\n"
-        "- **How to stay relevant in the AI Age?**"
-            )
-
-# Step 1: Scrape General Data
-def scrape_general_data():
-    urls = [
-        "https://content.mycareersfuture.gov.sg/stressed-interview-outfits-guide/",
-        "https://content.mycareersfuture.gov.sg/25-soft-skills-make-your-resume-stand-out/",
-        "https://content.mycareersfuture.gov.sg/fresh-grad-no-experience-how-get-first-job/",
-        "https://content.mycareersfuture.gov.sg/mid-career-plateau-30s-check-career-health/",
-        "https://content.mycareersfuture.gov.sg/career-guidance-middle-aged-singapore-polaris-wsg/",
-        "https://content.mycareersfuture.gov.sg/futureproof-your-career-in-the-age-of-ai-6-expert-career-specialist/",
-        "https://content.mycareersfuture.gov.sg/jobs-skills-consider-second-half-career-mature-worker/",
-        "https://content.mycareersfuture.gov.sg/career-resilience-skills-mindsets-relevance-industries/",
-        "https://www.myskillsfuture.gov.sg/content/portal/en/career-resources/career-resources/education-career-personal-development/skillsfuture-advice.html"
-    ]
-
-    scraped_info = []
-
-    for url in urls:
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            # Extract relevant information: paragraphs, headings, lists, etc.
-            paragraphs = [p.get_text().strip() for p in soup.find_all('p')]
-            headings = [h.get_text().strip() for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])]
-            lists = [li.get_text().strip() for li in soup.find_all('li')]
-
-            # Combine all extracted information
-            page_data = {
-                'url': url,
-                'headings': headings,
-                'paragraphs': paragraphs,
-                'lists': lists
-            }
-            scraped_info.append(page_data)
-
-        except requests.exceptions.RequestException as e:
-            st.error(f"Failed to fetch data from {url}: {e}")
+# The OpenAI, retrieval and indexing modules are only imported once the user is past the login screen.
+from helper_functions import resources, retrieval, router, answer_cache, streaming, pipeline, prompt_budget, tracing
 
-    return scraped_info
+# Shared OpenAI clients, created once per process (see helper_functions/resources.py)
+client = resources.get_client()
+# Async client on the shared event loop, for LLM stages that run concurrently
+async_client = resources.get_async_client()
 
-# Step 2: Identify Relevant Information Based on User Query
-def identify_relevant_information(user_message, scraped_data):
+# Examples of questions
+st.subheader("Example Questions:")
+example_questions = [
+    "What are the best ways to upskill in a changing job market?",
+    "How to stay relevant in the AI Age?",
+]
+st.markdown("\n".join(f"- **{question}**" for question in example_questions))
+
+# Step 1: Identify Relevant Information Based on User Query
+def identify_relevant_information(user_message, corpus_index, query_vector=None):
+    # BM25 and a cosine top-k over the pre-embedded corpus chunks, fused; the query was embedded (or not) already.
+    relevant_chunks = retrieval.retrieve(client, corpus_index, user_message, k=retrieval.DEFAULT_TOP_K,
+                                         query_vector=query_vector, embed=False)
+    return [chunk['text'] for chunk in relevant_chunks]
+
+# Step 2: Generate a Detailed Response
+async def generate_response_based_on_scraped_info(user_message, relevant_info):
     delimiter = "####"
 
-    # Consolidate all scraped information into a single string for easier LLM processing.
-    content = ""
-    for page in scraped_data:
-        content += f"Headings: {page['headings']}\n"
-        content += f"Paragraphs: {page['paragraphs']}\n"
-        content += f"Lists: {page['lists']}\n"
-
-    system_message = f"""
-    You will be provided with a user query related to career guidance. \
-    The user query will be enclosed in the pair of {delimiter}. \
-    
-    You have the following information available that was scraped from official sources:
-    {content}
-
-    Decide which part of the information is most relevant to answer the user's query. \
-    The output should include relevant headings, paragraphs, or list items that are relevant to the user's query. \
-    
-    If no relevant information is found, output an empty JSON array: [].
-
-    Ensure your response is **only** a valid JSON array containing the most relevant points, without any additional text or comments.
-    """
-
-    messages = [
-        {'role': 'system', 'content': system_message},
-        {'role': 'user', 'content': f"{delimiter}{user_message}{delimiter}"},
-    ]
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        max_tokens=2048,
-        temperature=0.7
-    )
-
-    relevant_information_response_str = response.choices[0].message.content
+    # The prompt is built for whatever evidence fits the token budget (best-ranked first).
+    def render(info):
+        system_message = f"""
+        Follow these steps to answer user queries related to career guidance.
+        The user query will be delimited with a pair of {delimiter}.
+
+        Step 1:{delimiter} If the user is asking about career guidance, \
+        understand the relevant information from the list below.
+        Available details are shown in the JSON data below:
+        {info}
+
+        Step 2:{delimiter} Use the information to generate an answer to the user query.
+        Your response should be detailed, comprehensive, and help the user understand the career guidance for them.
+
+        Step 3:{delimiter} Answer the user in a friendly and informative tone.
+        Make sure the statements are factually accurate. The response should be complete with helpful information \
+        that assists the user in thier carrer journey.
+
+        Use the following format:
+        Step 1:{delimiter} <step 1 reasoning>
+        Step 2:{delimiter} <step 2 reasoning>
+        Step 3:{delimiter} <step 3 response to user>
+
+        Make sure to include {delimiter} to separate every step.
+        """
+
+        return [
+            {'role': 'system', 'content': system_message},
+            {'role': 'user', 'content': f"{delimiter}{user_message}{delimiter}"},
+        ]
+
+    with tracing.span("llm.answer"):
+        messages = prompt_budget.pack_messages(render, relevant_info, model="gpt-4o-mini", max_tokens=2048,
+                                               label="career_guidance")
+
+        # Streamed; the page keeps only the Step 3 text (see streaming.final_section).
+        async for delta in streaming.astream_chat(async_client, messages, model="gpt-4o-mini", max_tokens=2048,
+                                                  temperature=0.7):
+            yield delta
+
+# Generate a short response to use as the subheader
+async def generate_subheader(user_message):
+    messages = prompt_budget.measure([
+        {
+            'role': 'user', 'content': f"""Provide a brief subheader to the following query: '{user_message}'
         
-    # Attempt to extract valid JSON using regex
-    json_match = re.search(r'(\[.*\])', relevant_information_response_str, re.DOTALL)
-    if json_match:
-        relevant_information_response_str = json_match.group(1)
-    else:
-        st.error("Failed to find JSON in the response from the LLM. Please try again.")
-        return []
-
-    # Try parsing the JSON
-    try:
-        relevant_information = json.loads(relevant_information_response_str)
-    except json.JSONDecodeError:
-        st.error("Failed to parse the response from the LLM. Please try again.")
-        relevant_information = []
-
-    return relevant_information
-
-# Step 3: Generate a Detailed Response
-def generate_response_based_on_scraped_info(user_message, relevant_info):
-    delimiter = "####"
-
-    system_message = f"""
-    Follow these steps to answer user queries related to career guidance.
-    The user query will be delimited with a pair of {delimiter}.
-
-    Step 1:{delimiter} If the user is asking about career guidance, \
-    understand the relevant information from the list below.
-    Available details are shown in the JSON data below:
-    {relevant_info}
-
-    Step 2:{delimiter} Use the information to generate an answer to the user query.
-    Your response should be detailed, comprehensive, and help the user understand the career guidance for them.
-
-    Step 3:{delimiter} Answer the user in a friendly and informative tone.
-    Make sure the statements are factually accurate. The response should be complete with helpful information \
-    that assists the user in thier carrer journey.
-
-    Use the following format:
-    Step 1:{delimiter} <step 1 reasoning>
-    Step 2:{delimiter} <step 2 reasoning>
-    Step 3:{delimiter} <step 3 response to user>
-
-    Make sure to include {delimiter} to separate every step.
-    """
-
-    messages = [
-        {'role': 'system', 'content': system_message},
-        {'role': 'user', 'content': f"{delimiter}{user_message}{delimiter}"},
-    ]
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        max_tokens=2048,
-        temperature=0.7
-    )
-
-    response_to_user = response.choices[0].message.content
-    response_to_user = response_to_user.split(delimiter)[-1]
-    return response_to_user
-
-# Step 4: Main Query Handling
-scraped_data = scrape_general_data()  # Move scraped_data outside the if block to make it accessible globally
+            This response should be suitable as a subheader, limited to 1-2 sentences, 
+            to ensure a clear and engaging subheader. No need for quote."""
+            }
+    ], max_tokens=1024, label="career_guidance_subheader")
+    with tracing.span("llm.subheader"):
+        subheader_response = await async_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=1024,
+            temperature=0.7
+        )
+        tracing.record_usage(subheader_response.usage)
+    return subheader_response.choices[0].message.content.strip()
+
+# Step 3: Main Query Handling
+# The corpus is scraped and indexed in the background (helper_functions/refresher.py);
+# requests only read the latest ready snapshot, memory-mapped from disk.
+resources.start_refresher()
+try:
+    corpus_index = resources.get_corpus_index("career_guidance")
+except Exception as e:
+    # Only on a cold machine that cannot reach the source pages; the next page load tries again.
+    st.error(f"Failed to fetch the source pages: {e}")
+    st.stop()
 
 user_query = st.text_area("Enter your question:", placeholder="E.g., 'What are the best ways to upskill in a changing job market??'", height=150)
 submit_button = st.button("Submit")
 
 if user_query and submit_button:
-    # Create a placeholder for status updates
-    status_placeholder = st.empty()
-    status_placeholder.text("Searching for relevant information...")
-
-    # Fetch the relevant information
-    relevant_info = identify_relevant_information(user_query, scraped_data)
-
-    if relevant_info:
-        # Generate a short response to use as the subheader
-        subheader_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    'role': 'user', 'content': f"""Provide a brief subheader to the following query: '{user_query}'
-                    
-                    This response should be suitable as a subheader, limited to 1-2 sentences, 
-                    to ensure a clear and engaging subheader. No need for quote."""
-                    }
-            ],
-            max_tokens=1024,
-            temperature=0.7
-        )
-        subheader_text = subheader_response.choices[0].message.content.strip()
-        
-        reply = generate_response_based_on_scraped_info(user_query, relevant_info)
-        st.subheader(subheader_text)
-        st.write(reply)
-
-        # Remove the "Searching for relevant information..." message
-        status_placeholder.empty()
-    else:
-        st.write(f"No relevant information found for your query.")
+    # Each request's stage timings and token counts go to the trace log (see the Performance page).
+    with tracing.trace("career_guidance", query_chars=len(user_query)):
+        # Greetings and off-topic queries get a canned reply, and the example questions their stored
+        # answer, without any API call; only genuine queries go through retrieval and the LLM.
+        with tracing.span("route"):
+            route = router.route(user_query, corpus_index, examples=example_questions,
+                                 topic="career guidance and upskilling")
+        tracing.annotate(route=route.kind)
+
+        if route.kind in (router.GREETING, router.OFF_TOPIC):
+            with tracing.span("render", cached=True):
+                st.write(route.reply)
+        else:
+            # Create a placeholder for status updates
+            status_placeholder = st.empty()
+            status_placeholder.text("Searching for relevant information...")
+
+            query_vector = None
+            cached_answer = None
+            if route.kind == router.EXAMPLE:
+                cached_answer = answer_cache.lookup_query("career_guidance", corpus_index['hash'], route.example)
+            if not cached_answer:
+                # The query embedding serves both the answer cache and retrieval. Keyword queries ("TeSA") are not
+                # embedded, and neither are queries while the embedding API is down; those use keyword search alone.
+                query_vector = retrieval.query_embedding(client, corpus_index, user_query)
+                if query_vector is not None:
+                    cached_answer, _ = answer_cache.lookup("career_guidance", corpus_index['hash'], query_vector)
+
+            if cached_answer:
+                # A near-identical question was already answered from this version of the corpus.
+                st.subheader(cached_answer['subheader'])
+                with tracing.span("render", cached=True):
+                    st.write(cached_answer['reply'])
+                status_placeholder.empty()
+            else:
+                # Fetch the relevant information
+                relevant_info = identify_relevant_information(user_query, corpus_index, query_vector)
+
+                if relevant_info:
+                    # The subheader and the answer are independent, so they run concurrently.
+                    answer_pipeline = pipeline.Pipeline([
+                        pipeline.Stage("subheader", lambda: generate_subheader(user_query)),
+                        pipeline.Stage("answer", lambda: generate_response_based_on_scraped_info(user_query, relevant_info)),
+                    ], label="career_guidance").start()
+                    subheader_text = answer_pipeline.result("subheader")
+                    st.subheader(subheader_text)
+                    answer = streaming.final_section(answer_pipeline.stream("answer"))
+                    with tracing.span("render"):
+                        reply = st.write_stream(streaming.timed(answer, label="career_guidance"))
+                    # An answer without a "Step 3:####" section streams nothing and is not cached.
+                    if reply and (query_vector is not None or route.example):
+                        # Example questions are stored under their listed wording, for the router's exact lookup,
+                        # even when they were answered without an embedding.
+                        answer_cache.store("career_guidance", corpus_index['hash'], route.example or user_query,
+                                           query_vector, {'subheader': subheader_text, 'reply': reply})
+
+                    # Remove the "Searching for relevant information..." message
+                    status_placeholder.empty()
+                else:
+                    st.write(f"No relevant information found for your query.")
 
 # Disclaimer
 with st.expander("❗IMPORTANT NOTICE: Disclaimer"):
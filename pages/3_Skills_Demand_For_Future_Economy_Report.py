@@ -1,172 +1,132 @@
-import os
-import requests
-import openai
 import streamlit as st
-import pdfplumber
-from io import BytesIO
-from dotenv import load_dotenv
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from helper_functions.utility import check_password 
-
-# Load environment variables (OpenAI API key)
-load_dotenv('.env')
-# Load environment variables (OpenAI API key)
-if load_dotenv('.env'):
-   # for local development
-   OPENAI_KEY = os.getenv('OPENAI_API_KEY')
-else:
-   OPENAI_KEY = st.secrets['OPENAI_API_KEY']
-
-# Pass the API Key to the OpenAI Client
-client = openai.OpenAI(api_key=OPENAI_KEY)
+from helper_functions.utility import check_password, show_refresh_status
+from helper_functions import report_library
 # Some other code here are omitted for brevity
 
+# The page serves every report in the library (reports.json), and is named after the report if there is only one.
+report_titles = report_library.titles()
+library_title = next(iter(report_titles.values())) if len(report_titles) == 1 else "Skills and Workforce Reports"
+
 # Streamlit UI Setup
-st.set_page_config(page_title="Skills Demand for the Future Economy 2023/24 report", layout="centered")
-st.title("📊 Skills Demand for the Future Economy 2023/24 report")
-st.subheader("Dive into the Skills Demand for the Future Economy 2023/24 report and discover key trends, industry shifts, and the skills you need to stay ahead!")
+st.set_page_config(page_title=library_title, layout="centered")
+st.title(f"📊 {library_title}")
+st.subheader(f"Dive into the {library_title if len(report_titles) == 1 else 'reports'} and discover key trends, industry shifts, and the skills you need to stay ahead!")
 st.write("Whether you're planning to boost your current career or pivot to a new opportunity, this tool will help you find actionable insights in a fun and engaging way! 🔍✨")
 
 # Check if the password is correct.  
 if not check_password():  
     st.stop() 
+show_refresh_status()
+
+# The OpenAI, retrieval and indexing modules are only imported once the user is past the login screen.
+import openai
+import requests
+from helper_functions import resources, answer_cache, report_answers, report_cache, report_qa, tracing
+
+# Shared OpenAI clients, created once per process (see helper_functions/resources.py)
+client = resources.get_client()
+# Async client on the shared event loop, for the concurrent per-chunk calls
+async_client = resources.get_async_client()
+
+# Reports to search: any of the reports in the library (see helper_functions/report_library.py)
+if len(report_titles) > 1:
+    picked = st.multiselect("Reports to search:", list(report_titles), default=report_library.default_selection(),
+                            format_func=report_titles.get)
+else:
+    picked = list(report_titles)
+# Registry order, so the same selection always shares its cached answers
+selected = [name for name in report_titles if name in picked]
 
 # Example questions section
 st.markdown("### Find Out More About the Report:")
-st.write("- What are the key findings of the report?")
-st.write("- What are the emerging industry trends?")
-st.write("- What skills should I develop to pivot to growth sectors?")         
+for question in dict.fromkeys(question for name in selected for question in report_answers.HEADLINE_QUESTIONS[name]):
+    st.write(f"- {question}")
 
 # Step 1: Download PDF Data
-pdf_url = "https://www.skillsfuture.gov.sg/docs/default-source/skills-report-2023/sdfe-2023.pdf"
-
-def download_pdf(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return BytesIO(response.content)
-    except requests.exceptions.RequestException as e:
-        st.error(f"Failed to download PDF: {e}")
-        return None
+# Each report's PDF URL comes from the report library (sources.REPORTS).
 
 # Step 2: Extract Text from PDF
+# The PDF is downloaded through the scrape cache and its extracted text and chunks are
+# stored under the PDF's content hash (see helper_functions/report_cache.py), so only
+# the first ever run pays for the download and extraction.
 
-def extract_text_from_pdf(pdf_file):
-    try:
-        text = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() + ""
-        return text
-    except Exception as e:
-        st.error(f"Failed to extract text from PDF: {e}")
-        return ""
-
-# Helper function to split text into manageable chunks
-def chunk_text(text, max_tokens=2000):
-    words = text.split()
-    chunks = []
-    current_chunk = []
-
-    for word in words:
-        current_chunk.append(word)
-        if len(" ".join(current_chunk)) > max_tokens:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = []
-
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-
-    return chunks
-
-# Step 3: Process Query and Generate Response using LLM with concurrency
-def generate_response(user_message, extracted_text):
-    # Chunk the extracted text
-    text_chunks = chunk_text(extracted_text, max_tokens=2000)
-    
-    # Limit to processing top N chunks (e.g., top 2 chunks)
-    top_chunks = text_chunks[:2]
-
-    responses = []
-
-    # Use ThreadPoolExecutor for concurrent processing of text chunks
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        future_to_chunk = {
-            executor.submit(process_chunk, chunk, user_message): chunk
-            for chunk in top_chunks 
-        }
-        for future in as_completed(future_to_chunk):
-            try:
-                response_content = future.result()
-                responses.append(response_content)
-            except Exception as e:
-                print(f"Exception occurred: {e}")
-
-    # Combine responses from each chunk
-    full_response = "\n".join(responses)
-
-    # Step 4: Generate Summary of Response
-    summary_prompt = f"""
-    Based on the detailed response below, provide a concise summary to guide the reader in making informed choices 
-    about upskilling to either stay relevant at their current workplace or to pivot to job opportunities with growth potential. 
-    
-    Must remind users in that response is based on information from the Skills Demand for the Future Economy 2023/24 report. 
-    Important to inform users for detailed information, refer to https://www.skillsfuture.gov.sg/docs/default-source/skills-report-2023/sdfe-2023.pdf.
-    
-    Detailed Response:
-    {full_response}
-    
-    Please focus the summary on key insights for individuals to make informed decisions on jobs and skills matters.
-    """
-    try:
-        summary_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{'role': 'system', 'content': summary_prompt}],
-            max_tokens=512,
-            temperature=0.7
-        )
-        summary = summary_response.choices[0].message.content.strip()
-    except Exception as e:
-        summary = "Summary generation failed."
-
-    return full_response, summary
-
-# Helper function to process each chunk separately
-def process_chunk(chunk, user_message):
-    system_message = f"""
-    You are given the following context extracted from the SkillsFuture 2023 Report:
-    {chunk}
-    
-    Based on this information, answer the following user query:
-    {user_message}
-    
-    Please provide a comprehensive and user-friendly response.
-    """
-    messages = [
-        {'role': 'system', 'content': system_message},
-        {'role': 'user', 'content': f"{chunk} {user_message}"},
-    ]
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        max_tokens=512,
-        temperature=0.7
-    )
-    return response.choices[0].message.content.strip()
+# Steps 3 and 4: Process Query and Generate Response using LLM with concurrency, then summarise
+# (helper_functions/report_qa.py, shared with the offline build of precomputed answers)
 
 # Step 5: Main Query Handling
-pdf_file = download_pdf(pdf_url)
-if pdf_file:
-    extracted_text = extract_text_from_pdf(pdf_file)
-
-    if extracted_text:
-        user_query = st.text_input("Enter your question about the SkillsFuture 2023/2024 Report:", placeholder="E.g., 'What are the key findings of the report?'")
-        submit_button = st.button("Submit")
-
-        if user_query and submit_button:
-            
-            full_response, summary = generate_response(user_query, extracted_text)
+# The reports are re-downloaded and re-indexed in the background (helper_functions/refresher.py);
+# requests read the latest ready index snapshot of the selected reports only, memory-mapped from disk.
+resources.start_refresher()
+documents = []
+for name in selected:
+    report_index = resources.get_index(name)
+
+    if report_index is None:
+        # Only the very first extraction of a report on this machine happens inline, with progress. It runs
+        # under the refresher's lock for the report, so the background refresh never builds it at the same time.
+        extraction_status = st.empty()
+        extraction_status.text(f"Reading the {report_titles[name]}...")
+        try:
+            report_index = resources.get_report_index(
+                name,
+                progress=lambda pages_done: extraction_status.text(
+                    f"Reading the {report_titles[name]}... {pages_done} pages extracted"),
+            )
+        except requests.exceptions.RequestException as e:
+            st.error(f"Failed to download PDF: {e}")
+        except report_cache.ExtractionError as e:
+            st.error(f"Failed to extract text from PDF: {e}")
+        except openai.OpenAIError as e:
+            st.error(f"Failed to embed the report: {e}")
+        except Exception as e:
+            st.error(f"Failed to index the report: {e}")
+        extraction_status.empty()
+
+    if report_index is not None and report_index['chunks']:
+        # With the report's summary tree when it has been built (helper_functions/summary_tree.py).
+        documents.append(report_library.open_document(name, report_index))
+
+if not selected:
+    st.info("Pick at least one report to search.")
+
+if documents:
+    for document in documents:
+        # Section-by-section summaries of the whole report, built offline with the precomputed answers.
+        report_sections = report_answers.sections(document.name, document.index['hash'])
+        if report_sections:
+            with st.expander(f"📑 {document.title} at a glance"):
+                for section in report_sections:
+                    pages = f"Pages {section['first_page']}–{section['last_page']}"
+                    st.markdown(f"**{section['title']}** ({pages})" if section['title'] else f"**{pages}**")
+                    st.write(section['summary'])
+
+    about = documents[0].title if len(documents) == 1 else "selected reports"
+    user_query = st.text_input(f"Enter your question about the {about}:", placeholder="E.g., 'What are the key findings of the report?'")
+    submit_button = st.button("Submit")
+
+    if user_query and submit_button:
+        names = [document.name for document in documents]
+        # Each request's stage timings and token counts go to the trace log (see the Performance page).
+        with tracing.trace("report_library", query_chars=len(user_query), documents=",".join(names)):
+            # The example questions above are answered when each report is indexed (helper_functions/report_answers.py).
+            cached_answer = None
+            if len(documents) == 1:
+                cached_answer = report_answers.answer(names[0], documents[0].index['hash'], user_query)
+            tracing.annotate(route="precomputed" if cached_answer else "full")
+            if not cached_answer:
+                # Repeated questions on the same reports are served from the semantic answer cache. Keyword
+                # queries, and any query while the embedding API is down, skip the cache and use keyword search.
+                namespace, version = "+".join(names), report_library.version(documents)
+                query_vector = report_library.query_embedding(client, documents, user_query)
+                if query_vector is not None:
+                    cached_answer, _ = answer_cache.lookup(namespace, version, query_vector)
+            if cached_answer:
+                summary = cached_answer['summary']
+            else:
+                full_response, summary = report_qa.generate_response(client, async_client, user_query, documents,
+                                                                     query_vector)
+                if summary not in (report_qa.SUMMARY_FAILED, report_qa.NO_RELEVANT_INFORMATION) and query_vector is not None:
+                    answer_cache.store(namespace, version, user_query, query_vector, {'summary': summary})
             st.subheader("Guided Summary:") 
-            st.write(summary)
\ No newline at end of file
+            with tracing.span("render", cached=bool(cached_answer)):
+                st.write(summary)
\ No newline at end of file
@@ -0,0 +1,72 @@
+import time
+import streamlit as st
+from helper_functions.utility import check_password, check_admin
+
+# region <--------- Streamlit App Configuration --------->
+st.set_page_config(
+    layout="wide",
+    page_title="⏱️Performance"
+)
+# endregion <--------- Streamlit App Configuration --------->
+
+st.title("⏱️ Performance")
+st.write("Per-stage latency, tokens and cache hits of recent requests, from the trace log.")
+
+# Check if the password is correct.
+if not check_password():
+    st.stop()
+# Admin-only: the traces describe every user's requests.
+if not check_admin():
+    st.stop()
+
+from helper_functions import tracing, router
+
+WINDOWS = {"Last hour": 3600, "Last 24 hours": 24 * 3600, "Last 7 days": 7 * 24 * 3600, "All": None}
+
+window = st.selectbox("Time window", list(WINDOWS), index=1)
+seconds = WINDOWS[window]
+records = tracing.read_traces(since=time.time() - seconds if seconds else None)
+
+if not records:
+    st.info("No traced requests in this window yet.")
+    st.stop()
+
+pages = sorted({record['page'] for record in records})
+selected_pages = st.multiselect("Pages", pages, default=[page for page in pages if page != "refresher"] or pages)
+records = [record for record in records if record['page'] in selected_pages]
+
+requests_traced = [record for record in records if record['page'] != "refresher"]
+errors = sum(1 for record in records if record.get('error'))
+col1, col2, col3 = st.columns(3)
+col1.metric("Requests", len(requests_traced))
+col2.metric("Refreshes", len(records) - len(requests_traced))
+col3.metric("Errors", errors)
+
+# p50/p95 per stage; "request" rows are the end-to-end time of each page's requests.
+st.subheader("Stages")
+st.dataframe(tracing.aggregate(records), use_container_width=True, hide_index=True)
+
+# Greetings, off-topic queries and example questions skip the full pipeline (see helper_functions/router.py).
+routing = router.savings(records)
+if routing:
+    st.subheader("Routing")
+    st.dataframe(routing, use_container_width=True, hide_index=True)
+
+st.subheader("Slowest requests")
+slowest = sorted(records, key=lambda record: record['seconds'], reverse=True)[:20]
+st.dataframe(
+    [
+        {
+            'time': time.strftime("%d %b %H:%M:%S", time.localtime(record['ts'])),
+            'page': record['page'],
+            'route': record.get('route'),
+            'seconds': record['seconds'],
+            'slowest stage': max(record['spans'], key=lambda s: s['seconds'])['stage'] if record['spans'] else None,
+            'stages': ", ".join(f"{s['stage']} {s['seconds']:.2f}s" for s in record['spans']),
+            'error': record.get('error'),
+        }
+        for record in slowest
+    ],
+    use_container_width=True,
+    hide_index=True,
+)